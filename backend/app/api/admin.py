@@ -0,0 +1,40 @@
+# app/api/admin.py
+
+import os
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.models.user import User
+from app.api.auth import get_current_user
+from app.core.slow_queries import slow_query_log
+from app.schemas.admin import SlowQueryOut
+
+# Email degli amministratori, separate da virgola (es. ADMIN_EMAILS=a@x.it,b@x.it)
+ADMIN_EMAILS = {
+    e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()
+}
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """Come get_current_user, ma solo per gli utenti in ADMIN_EMAILS."""
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo amministratori")
+    return current_user
+
+@router.get("/slow-queries", response_model=List[SlowQueryOut])
+def list_slow_queries(
+    limit: int = Query(default=50, ge=1, le=500),
+    admin: User = Depends(get_admin_user),
+):
+    """
+    Query lente raggruppate per fingerprint, dalla più costosa (tempo totale).
+    Dati in memoria del singolo worker: si azzerano al riavvio.
+    """
+    return slow_query_log.snapshot()[:limit]
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+def reset_slow_queries(admin: User = Depends(get_admin_user)):
+    """Azzera le statistiche (es. dopo aver aggiunto un indice)."""
+    slow_query_log.reset()
@@ -0,0 +1,123 @@
+# app/api/analytics.py
+
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models.product import Product
+from app.models.user import User
+from app.models.waste_rollup import WasteRollupMonthly
+from app.api.auth import get_current_user
+from app.api.households import get_membership_or_404
+from app.core.partitions import add_months, month_start
+from app.schemas.analytics import CategoryMonthTotal, PlatformMonthTotal, ProductWasteTotal
+from app.schemas.inventory import EventType
+
+# Le statistiche leggono SOLO i rollup (app/jobs/waste_rollup.py), mai consumption_events
+router = APIRouter(prefix="/api", tags=["analytics"])
+
+# Di default "spreco" = buttato + scaduto
+WASTE_TYPES = ["wasted", "expired"]
+
+def _first_month(months: int) -> date:
+    """Primo mese incluso in una finestra di 'months' mesi che termina col mese corrente."""
+    return add_months(month_start(date.today()), -(months - 1))
+
+@router.get(
+    "/households/{household_id}/analytics/waste-by-category",
+    response_model=List[CategoryMonthTotal],
+)
+def waste_by_category(
+    household_id: int,
+    months: int = Query(default=12, ge=1, le=60),
+    event_type: List[EventType] = Query(default=WASTE_TYPES),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Quantità per mese e categoria negli ultimi 'months' mesi.
+    """
+    get_membership_or_404(db, household_id, current_user.id)
+
+    r = WasteRollupMonthly
+    rows = (
+        db.query(
+            r.month, r.category, r.unit,
+            func.sum(r.quantity).label("quantity"),
+            func.sum(r.events).label("events"),
+        )
+        .filter(
+            r.household_id == household_id,
+            r.month >= _first_month(months),
+            r.event_type.in_(event_type),
+        )
+        .group_by(r.month, r.category, r.unit)
+        .order_by(r.month, r.category, r.unit)
+        .all()
+    )
+    return [CategoryMonthTotal(**row._mapping) for row in rows]
+
+@router.get(
+    "/households/{household_id}/analytics/top-wasted-products",
+    response_model=List[ProductWasteTotal],
+)
+def top_wasted_products(
+    household_id: int,
+    months: int = Query(default=3, ge=1, le=60),
+    limit: int = Query(default=10, ge=1, le=100),
+    event_type: List[EventType] = Query(default=WASTE_TYPES),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Classifica dei prodotti più sprecati della casa negli ultimi 'months' mesi.
+    """
+    get_membership_or_404(db, household_id, current_user.id)
+
+    r = WasteRollupMonthly
+    quantity = func.sum(r.quantity).label("quantity")
+    rows = (
+        db.query(
+            r.product_id, Product.name, Product.category, r.unit,
+            quantity, func.sum(r.events).label("events"),
+        )
+        .join(Product, Product.id == r.product_id)
+        .filter(
+            r.household_id == household_id,
+            r.month >= _first_month(months),
+            r.event_type.in_(event_type),
+        )
+        .group_by(r.product_id, Product.name, Product.category, r.unit)
+        .order_by(quantity.desc())
+        .limit(limit)
+        .all()
+    )
+    return [ProductWasteTotal(**row._mapping) for row in rows]
+
+@router.get("/analytics/platform", response_model=List[PlatformMonthTotal])
+def platform_stats(
+    months: int = Query(default=12, ge=1, le=60),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Statistiche aggregate di tutta la piattaforma (nessun dato della singola casa).
+    """
+    r = WasteRollupMonthly
+    rows = (
+        db.query(
+            r.month, r.event_type, r.unit,
+            func.sum(r.quantity).label("quantity"),
+            func.sum(r.events).label("events"),
+            func.count(func.distinct(r.household_id)).label("households"),
+        )
+        .filter(r.month >= _first_month(months))
+        .group_by(r.month, r.event_type, r.unit)
+        .order_by(r.month, r.event_type, r.unit)
+        .all()
+    )
+    return [PlatformMonthTotal(**row._mapping) for row in rows]
@@ -3,6 +3,7 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from app.db import get_db
+from app.core.batch import current_batch
 from app.models.user import User
 from app.schemas.auth import UserCreate, UserOut, Token
 from app.core.security import (
@@ -67,7 +68,12 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     """
     Prende il token dall'header Authorization: Bearer <token>,
     lo decodifica e carica l'utente dal DB
+    (dentro POST /api/batch riusa l'utente già risolto per lo stesso token)
     """
+    batch = current_batch()
+    if batch is not None and batch.token == token:
+        return batch.user
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         sub: str | None = payload.get("sub")
@@ -0,0 +1,139 @@
+# app/api/batch.py
+
+import json
+from typing import List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models.user import User
+from app.api.auth import get_current_user, oauth2_scheme
+from app.core.batch import BatchContext, enter_batch, exit_batch
+from app.schemas.batch import BatchRequest, BatchResponse, SubRequest, SubResponse
+
+router = APIRouter(prefix="/api", tags=["batch"])
+
+BATCH_PATH = "/api/batch"
+
+# Header della richiesta batch che valgono per tutte le sotto-richieste
+INHERITED_HEADERS = {"authorization", "accept-language", "user-agent"}
+# Header che una sotto-richiesta non può impostare da sola
+FORBIDDEN_HEADERS = {"authorization", "host", "content-length", "content-type", "cookie"}
+
+
+def _sub_scope(request: Request, sub: SubRequest, body: bytes) -> dict:
+    """Scope ASGI della sotto-richiesta, ricavato da quello della richiesta batch."""
+    path, _, query = sub.path.partition("?")
+    headers: List[Tuple[bytes, bytes]] = [
+        (k, v) for k, v in request.scope["headers"] if k.decode("latin-1") in INHERITED_HEADERS
+    ]
+    headers += [
+        (k.lower().encode("latin-1"), v.encode("latin-1"))
+        for k, v in sub.headers.items()
+        if k.lower() not in FORBIDDEN_HEADERS
+    ]
+    if body:
+        headers += [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())]
+    return {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": sub.method,
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+    }
+
+
+async def _dispatch(request: Request, sub: SubRequest) -> Tuple[int, bytes, str]:
+    """Esegue la sotto-richiesta sull'app stessa (middleware e router inclusi)."""
+    body = json.dumps(sub.body).encode() if sub.body is not None else b""
+    sent = False
+    status = 500
+    chunks: List[bytes] = []
+    content_type = ""
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, content_type
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            for k, v in message.get("headers", []):
+                if k.lower() == b"content-type":
+                    content_type = v.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(_sub_scope(request, sub, body), receive, send)
+    except Exception:
+        # l'app ha già mandato il 500 (ServerErrorMiddleware) e poi rilancia
+        status = 500
+    return status, b"".join(chunks), content_type
+
+
+def _expire_all_but(db: Session, keep: object) -> None:
+    """Come db.expire_all(), ma lascia caricato 'keep'."""
+    for obj in list(db.identity_map.values()):
+        if obj is not keep:
+            db.expire(obj)
+
+
+def _decode(raw: bytes, content_type: str):
+    if not raw:
+        return None
+    if content_type.startswith("application/json"):
+        return json.loads(raw)
+    return raw.decode("utf-8", errors="replace")
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch(
+    payload: BatchRequest,
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Più chiamate API in una sola richiesta HTTP (es. avvio dell'app mobile:
+    /api/auth/me + /api/households/ + /api/households/{id} per ogni casa).
+
+    - le sotto-richieste girano in ordine, nello stesso processo, sulle rotte normali
+    - utente e Session sono risolti una volta sola e condivisi da tutte
+    - ogni sotto-richiesta ha il suo status: un errore non ferma le altre
+      (dopo un errore facciamo rollback, così la successiva parte pulita)
+    - prima di ogni sotto-richiesta gli oggetti della Session vengono scaduti: una
+      scrittura dopo una lettura non deve riusare gli oggetti caricati prima
+      (tranne l'utente, già risolto: non lo rileggiamo a ogni sotto-richiesta)
+    """
+    for sub in payload.requests:
+        if not sub.path.startswith("/api/") or sub.path.split("?")[0].rstrip("/") == BATCH_PATH:
+            raise HTTPException(status_code=422, detail=f"Path non ammesso in una batch: {sub.path}")
+
+    ctx_token = enter_batch(BatchContext(db=db, user=current_user, token=token))
+    try:
+        responses = []
+        for sub in payload.requests:
+            _expire_all_but(db, current_user)
+            status, raw, content_type = await _dispatch(request, sub)
+            if status >= 400:
+                await run_in_threadpool(db.rollback)
+            responses.append(SubResponse(id=sub.id, status=status, body=_decode(raw, content_type)))
+    finally:
+        exit_batch(ctx_token)
+    return BatchResponse(responses=responses)
@@ -2,8 +2,10 @@
 
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import func, literal, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 # Importiamo il "come ottenere una sessione DB"
 from app.db import get_db
@@ -16,10 +18,19 @@ from app.models.user import User
 # Importiamo la funzione che ci dice chi è l'utente loggato (dal router auth)
 from app.api.auth import get_current_user
 
+# Idempotency-Key per i retry dei client mobile
+from app.core.idempotency import (
+    get_idempotency_key, replay, request_hash, request_scope, store
+)
+
+# GET identiche e contemporanee condividono un solo caricamento
+from app.core.singleflight import SingleFlight
+
 # Importiamo gli schemi Pydantic appena creati
 from app.schemas.household import (
     HouseholdCreate,
     HouseholdOut,
+    HouseholdFieldsOut,
     HouseholdMemberOut,
     HouseholdInvite,
 )
@@ -30,6 +41,9 @@ router = APIRouter(
     tags=["households"],       # nome del gruppo nelle API docs
 )
 
+# chiave: (household_id, campi richiesti), scope: household_id (forget dopo le scritture)
+household_flight = SingleFlight("household")
+
 def serialize_household(hh: Household) -> HouseholdOut:
     """
     Converte un oggetto Household (ORM) in HouseholdOut (Pydantic).
@@ -55,58 +69,147 @@ def serialize_household(hh: Household) -> HouseholdOut:
         members=members_data,
     )
 
-@router.get("/", response_model=List[HouseholdOut])
+# Campi che il client può chiedere con ?fields= (l'id c'è sempre)
+HOUSEHOLD_FIELDS = {"name", "members", "member_count"}
+DEFAULT_FIELDS = frozenset({"name", "members"})  # risposta di sempre
+
+def get_household_fields(
+    fields: str | None = Query(
+        default=None,
+        description="Campi da restituire, separati da virgola: name, members, member_count. "
+                    "Default: name,members",
+    ),
+) -> frozenset[str]:
+    """Dependency: legge ?fields=name,member_count (422 se c'è un campo sconosciuto)."""
+    if fields is None:
+        return DEFAULT_FIELDS
+    requested = {f.strip() for f in fields.split(",") if f.strip()} - {"id"}
+    unknown = requested - HOUSEHOLD_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Campi sconosciuti: {', '.join(sorted(unknown))}",
+        )
+    return frozenset(requested)
+
+def query_households(db: Session, fields: frozenset[str]):
+    """
+    Query delle case che carica solo quello che serve ai campi richiesti:
+    - members: membri e utenti con due SELECT ... IN (selectinload), niente N+1
+    - member_count: COUNT(*) correlato su household_members (indice su household_id)
+    - altrimenti household_members e users non vengono toccati (members resta lazy
+      e serialize_household_fields non lo legge)
+    Le righe sono tuple (Household, member_count o None).
+    """
+    member_count = (
+        select(func.count())
+        .where(HouseholdMember.household_id == Household.id)
+        .correlate(Household)
+        .scalar_subquery()
+        if "member_count" in fields
+        else literal(None)
+    )
+    q = db.query(Household, member_count.label("member_count"))
+    if "members" in fields:
+        q = q.options(selectinload(Household.members).selectinload(HouseholdMember.user))
+    return q
+
+def serialize_household_fields(
+    hh: Household, fields: frozenset[str], member_count: int | None = None
+) -> HouseholdFieldsOut:
+    """Come serialize_household, ma imposta solo i campi richiesti."""
+    data = {"id": hh.id}
+    if "name" in fields:
+        data["name"] = hh.name
+    if "members" in fields:
+        data["members"] = serialize_household(hh).members
+    if "member_count" in fields:
+        data["member_count"] = member_count
+    return HouseholdFieldsOut(**data)
+
+@router.get(
+    "/",
+    response_model=List[HouseholdFieldsOut],
+    response_model_exclude_unset=True,
+)
 def list_households(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    fields: frozenset[str] = Depends(get_household_fields),
 ):
     """
     Restituisce tutte le case di cui l'utente loggato è membro.
     - Usiamo una JOIN tra Household e HouseholdMember
     - Filtriamo per HouseholdMember.user_id == current_user.id
+    - ?fields=name,member_count per un selettore: niente membri da caricare
     """
-    households = (
-        db.query(Household)
+    rows = (
+        query_households(db, fields)
         .join(HouseholdMember)
         .filter(HouseholdMember.user_id == current_user.id)
+        .order_by(Household.id)
         .all()
     )
 
-    # Convertiamo ogni Household in HouseholdOut tramite l'helper
-    return [serialize_household(hh) for hh in households]
+    return [serialize_household_fields(hh, fields, count) for hh, count in rows]
 
 @router.post("/", response_model=HouseholdOut, status_code=status.HTTP_201_CREATED)
 def create_household(
     payload: HouseholdCreate,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency_key: str | None = Depends(get_idempotency_key),
 ):
     """
     Crea una nuova casa e rende l'utente corrente "owner".
-    Passi:
-    1. creiamo Household (solo con il nome)
-    2. creiamo HouseholdMember che collega current_user a quella casa con role="owner"
+    Un solo statement (CTE) e un solo commit:
+    1. INSERT della Household ... RETURNING id
+    2. INSERT della HouseholdMember owner che usa quell'id
+    Con header Idempotency-Key un retry restituisce la stessa casa invece di crearne un'altra.
     """
-    # 1) Creiamo l'oggetto Household
-    hh = Household(name=payload.name)
-    db.add(hh)
-    db.commit()
-    db.refresh(hh)  # aggiorna hh con id assegnato dal DB
+    scope = request_scope(request)
+    body_hash = request_hash(payload)
+    if idempotency_key:
+        saved = replay(db, current_user.id, idempotency_key, scope, body_hash)
+        if saved is not None:
+            return saved
 
-    # 2) Creiamo la membership per il creatore, ruolo owner
-    membership = HouseholdMember(
-        user_id=current_user.id,
-        household_id=hh.id,
-        role="owner",
+    hh = (
+        pg_insert(Household)
+        .values(name=payload.name)
+        .returning(Household.id)
+        .cte("hh")
     )
-    db.add(membership)
-    db.commit()
-    db.refresh(hh)  # ricarichiamo hh così da vedere hh.members aggiornato
+    stmt = (
+        pg_insert(HouseholdMember)
+        .from_select(
+            ["user_id", "household_id", "role"],
+            select(literal(current_user.id), hh.c.id, literal("owner")),
+        )
+        .returning(HouseholdMember.household_id)
+        .add_cte(hh)
+    )
+    household_id = db.execute(stmt).scalar_one()
 
-    # Importante: accediamo a hh.members così SQLAlchemy carica i membri
-    _ = hh.members
+    # la casa è appena nata: l'unico membro è il creatore, niente da ricaricare
+    out = HouseholdOut(
+        id=household_id,
+        name=payload.name,
+        members=[
+            HouseholdMemberOut(id=current_user.id, email=current_user.email, role="owner")
+        ],
+    )
 
-    return serialize_household(hh)
+    if idempotency_key and not store(
+        db, current_user.id, idempotency_key, scope, body_hash, status.HTTP_201_CREATED, out
+    ):
+        # una richiesta gemella è arrivata prima: annulliamo e restituiamo la sua risposta
+        db.rollback()
+        return replay(db, current_user.id, idempotency_key, scope, body_hash)
+
+    db.commit()
+    return out
 
 def get_membership_or_404(
     db: Session, household_id: int, user_id: int
@@ -130,85 +233,128 @@ def get_membership_or_404(
 
     return membership
 
-@router.get("/{household_id}", response_model=HouseholdOut)
+@router.get(
+    "/{household_id}",
+    response_model=HouseholdFieldsOut,
+    response_model_exclude_unset=True,
+)
 def get_household(
     household_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    fields: frozenset[str] = Depends(get_household_fields),
 ):
     """
     Restituisce i dettagli di una singola casa (se l'utente ne è membro).
     Usa get_membership_or_404 per verificare che l'utente appartenga alla casa.
+    Con ?fields= carica solo i campi richiesti (vedi query_households).
+    Richieste uguali e contemporanee (anche di utenti diversi) condividono caricamento
+    e serializzazione; il controllo di membership resta per ogni chiamante.
     """
-    # Verifica membership (404 se non appartiene)
+    # Verifica membership (404 se non appartiene): sempre, per ogni richiesta
     _membership = get_membership_or_404(db, household_id, current_user.id)
 
-    # Ora possiamo caricare la casa
-    hh = db.query(Household).get(household_id)
-    if not hh:
-        raise HTTPException(status_code=404, detail="Household non trovata")
-
-    # assicuriamoci che i membri siano caricati
-    _ = hh.members
+    def load() -> HouseholdFieldsOut:
+        # casa con i membri solo se richiesti; risultato già serializzato (condiviso)
+        row = query_households(db, fields).filter(Household.id == household_id).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Household non trovata")
+        hh, member_count = row
+        return serialize_household_fields(hh, fields, member_count)
 
-    return serialize_household(hh)
+    return household_flight.do((household_id, fields), load, scope=household_id)
 
 @router.post("/{household_id}/members", response_model=HouseholdOut)
 def add_member(
     household_id: int,
     payload: HouseholdInvite,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency_key: str | None = Depends(get_idempotency_key),
 ):
     """
     Aggiunge un utente già registrato alla casa, tramite email.
     Solo chi ha ruolo 'owner' può farlo.
-    Passi:
-    1. controlla che current_user sia 'owner' della casa
-    2. trova l'utente da aggiungere per email
-    3. controlla che non sia già membro
-    4. crea HouseholdMember e restituisce la casa aggiornata
+    Controlli e inserimento avvengono in un solo statement:
+    - 'me': ruolo dell'utente corrente nella casa
+    - 'target': id dell'utente da aggiungere
+    - 'ins': INSERT ... ON CONFLICT (uq_user_household) DO NOTHING RETURNING,
+      eseguito solo se 'me' è owner
+    Il vincolo unico chiude la corsa "controlla e poi inserisci" tra due inviti uguali.
     """
-    # 1) membership dell'utente corrente
-    my_membership = get_membership_or_404(db, household_id, current_user.id)
-    if my_membership.role != "owner":
+    scope = request_scope(request)
+    body_hash = request_hash(payload)
+    if idempotency_key:
+        saved = replay(db, current_user.id, idempotency_key, scope, body_hash)
+        if saved is not None:
+            return saved
+
+    me = (
+        select(HouseholdMember.role)
+        .where(
+            HouseholdMember.household_id == household_id,
+            HouseholdMember.user_id == current_user.id,
+        )
+        .cte("me")
+    )
+    target = select(User.id).where(User.email == payload.email).cte("target")
+    ins = (
+        pg_insert(HouseholdMember)
+        .from_select(
+            ["user_id", "household_id", "role"],
+            select(target.c.id, literal(household_id), literal(payload.role))
+            .select_from(target)
+            .join(me, true())
+            .where(me.c.role == "owner"),
+        )
+        .on_conflict_do_nothing(constraint="uq_user_household")
+        .returning(HouseholdMember.user_id)
+        .cte("ins")
+    )
+    result = db.execute(
+        select(
+            select(me.c.role).scalar_subquery().label("my_role"),
+            select(target.c.id).scalar_subquery().label("target_id"),
+            select(ins.c.user_id).scalar_subquery().label("inserted_id"),
+        )
+    ).one()
+
+    # stessi errori (e stesso ordine) dei controlli di prima
+    if result.my_role is None:
+        raise HTTPException(status_code=404, detail="Household non trovata")
+    if result.my_role != "owner":
         # 403: Forbidden -> ha accesso alla casa ma non i permessi
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Solo il proprietario può aggiungere membri",
         )
-
-    # 2) trova l'utente da invitare tramite email
-    user_to_add = db.query(User).filter(User.email == payload.email).first()
-    if not user_to_add:
+    if result.target_id is None:
         raise HTTPException(
             status_code=404,
             detail="Utente con questa email non trovato",
         )
-
-    # 3) controlla che non sia già membro di quella casa
-    existing = (
-        db.query(HouseholdMember)
-        .filter(
-            HouseholdMember.household_id == household_id,
-            HouseholdMember.user_id == user_to_add.id,
-        )
-        .first()
-    )
-    if existing:
+    if result.inserted_id is None:
         raise HTTPException(status_code=400, detail="Utente già membro di questa casa")
 
-    # 4) crea la nuova membership
-    membership = HouseholdMember(
-        user_id=user_to_add.id,
-        household_id=household_id,
-        role=payload.role,
+    # casa aggiornata con membri e utenti in una sola query, prima del commit;
+    # populate_existing: la Session può già avere la casa con i membri di prima
+    hh = (
+        db.query(Household)
+        .options(joinedload(Household.members).joinedload(HouseholdMember.user))
+        .filter(Household.id == household_id)
+        .populate_existing()
+        .one()
     )
-    db.add(membership)
-    db.commit()
+    out = serialize_household(hh)
 
-    # ricarica la casa con i membri aggiornati
-    hh = db.query(Household).get(household_id)
-    _ = hh.members
+    if idempotency_key and not store(
+        db, current_user.id, idempotency_key, scope, body_hash, status.HTTP_200_OK, out
+    ):
+        db.rollback()
+        return replay(db, current_user.id, idempotency_key, scope, body_hash)
 
-    return serialize_household(hh)
+    db.commit()
+    # le GET della casa già in volo sono partite prima del commit: non ci si aggancia più
+    household_flight.forget(household_id)
+    return out
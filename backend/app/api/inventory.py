@@ -0,0 +1,151 @@
+# app/api/inventory.py
+
+from datetime import date, datetime, timezone
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models.consumption_event import ConsumptionEvent
+from app.models.inventory_item import InventoryItem
+from app.models.user import User
+from app.api.auth import get_current_user
+from app.api.households import get_membership_or_404
+from app.core.expiry_index import expiry_index
+from app.schemas.inventory import (
+    CategorySuggestionOut,
+    ConsumptionEventCreate,
+    ConsumptionEventOut,
+    ExpiringItemOut,
+    UseItUpOut,
+)
+
+# Rotte dell'inventario, annidate sotto la casa
+router = APIRouter(
+    prefix="/api/households/{household_id}",
+    tags=["inventory"],
+)
+
+@router.post(
+    "/items/{item_id}/events",
+    response_model=ConsumptionEventOut,
+    status_code=status.HTTP_201_CREATED,
+)
+def record_event(
+    household_id: int,
+    item_id: int,
+    payload: ConsumptionEventCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Registra che (una parte di) un item è stato consumato, buttato o è scaduto.
+    Passi, tutti nella stessa transazione:
+    1. scala la quantità dall'item (e lo cancella se arriva a zero)
+    2. aggiunge una riga append-only in consumption_events
+    Così il dato sullo spreco non si perde quando l'item sparisce.
+    L'item viene letto con SELECT ... FOR UPDATE: due eventi contemporanei sullo stesso
+    item si mettono in fila, il secondo vede la quantità già scalata dal primo.
+    """
+    get_membership_or_404(db, household_id, current_user.id)
+
+    item = db.get(InventoryItem, item_id, with_for_update=True, populate_existing=True)
+    if not item or item.household_id != household_id:
+        raise HTTPException(status_code=404, detail="Item non trovato")
+
+    quantity = payload.quantity or item.quantity
+    if quantity > item.quantity:
+        raise HTTPException(status_code=400, detail="Quantità superiore a quella disponibile")
+
+    event = ConsumptionEvent(
+        household_id=household_id,
+        product_id=item.product_id,
+        inventory_item_id=item.id,
+        event_type=payload.event_type,
+        quantity=quantity,
+        unit=item.unit,
+        # timestamp esplicito: decide subito in quale partizione finisce la riga
+        occurred_at=datetime.now(tz=timezone.utc),
+    )
+    db.add(event)
+
+    item.quantity -= quantity
+    if item.quantity == 0:
+        db.delete(item)
+
+    db.commit()
+    return event
+
+@router.get("/events", response_model=List[ConsumptionEventOut])
+def list_events(
+    household_id: int,
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Ultimi eventi della casa, dal più recente.
+    Usa l'indice (household_id, occurred_at): Postgres legge solo le partizioni recenti.
+    """
+    get_membership_or_404(db, household_id, current_user.id)
+
+    return (
+        db.query(ConsumptionEvent)
+        .filter(ConsumptionEvent.household_id == household_id)
+        .order_by(ConsumptionEvent.occurred_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+@router.get("/suggestions", response_model=UseItUpOut)
+def use_it_up(
+    household_id: int,
+    horizon_days: int = Query(default=7, ge=0, le=60),
+    limit: int = Query(default=20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Cosa usare per primo: item che scadono entro 'horizon_days', ordinati per urgenza,
+    più le categorie con almeno due item in scadenza (da usare insieme).
+    Legge dall'indice in memoria (app/core/expiry_index.py), non scansiona l'inventario.
+    """
+    get_membership_or_404(db, household_id, current_user.id)
+
+    expiry_index.ensure_loaded(db, household_id)
+    scored = expiry_index.score(household_id, date.today(), horizon_days)
+
+    # combinazioni: dall'indice categoria -> item, solo gli item in scadenza
+    by_id = {s.item.id: s for s in scored}
+    combinations = []
+    for category, item_ids in expiry_index.categories(household_id).items():
+        group = sorted(
+            (by_id[i] for i in item_ids if i in by_id),
+            key=lambda s: s.score,
+            reverse=True,
+        )
+        if len(group) > 1:
+            combinations.append(CategorySuggestionOut(
+                category=category,
+                score=sum(s.score for s in group),
+                item_ids=[s.item.id for s in group],
+            ))
+    combinations.sort(key=lambda g: g.score, reverse=True)
+
+    items = [
+        ExpiringItemOut(
+            item_id=s.item.id,
+            product_id=s.item.product_id,
+            product_name=s.item.product_name,
+            category=s.item.category,
+            quantity=s.item.quantity,
+            unit=s.item.unit,
+            location=s.item.location,
+            expires_at=s.item.expires_at,
+            days_left=s.days_left,
+            score=s.score,
+        )
+        for s in scored[:limit]
+    ]
+    return UseItUpOut(items=items, combinations=combinations)
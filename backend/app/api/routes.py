@@ -1,10 +1,59 @@
 # sottomodulo di rotte
-from fastapi import APIRouter
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+
+from functools import lru_cache
+
+from app.db import get_engine
+from app.core import metrics
+from app.core.readiness import ReadinessCheck
 
 # creazione router, separazione delle routes per area, più ordinato e scalabile
 router = APIRouter()
 
+# Token per lo scrape delle metriche (Prometheus: authorization: {credentials: ...});
+# senza token /api/metrics risponde solo ai client in METRICS_ALLOWED_HOSTS
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# IP ammessi senza token, separati da virgola (vuoto di default: dietro un reverse
+# proxy tutte le richieste arrivano dal suo indirizzo, allowlist solo se lo scrape è diretto)
+METRICS_ALLOWED_HOSTS = {
+    h.strip() for h in os.getenv("METRICS_ALLOWED_HOSTS", "").split(",") if h.strip()
+}
+
+def require_metrics_access(request: Request) -> None:
+    """Le metriche non sono pubbliche: token Bearer METRICS_TOKEN o IP in allowlist."""
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if (
+        METRICS_TOKEN
+        and scheme.lower() == "bearer"
+        and hmac.compare_digest(credentials.encode(), METRICS_TOKEN.encode())
+    ):
+        return
+    if request.client is not None and request.client.host in METRICS_ALLOWED_HOSTS:
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Metriche non accessibili")
+
+# un controllo (con cache) per processo, sull'engine dell'app
+@lru_cache(maxsize=None)
+def get_readiness() -> ReadinessCheck:
+    return ReadinessCheck(get_engine())
+
 # creazione route GET su /health dentro questo router
+# liveness: il processo risponde, non tocca il database
 @router.get("/health")
 def healthcheck():
     return {"status": "ok"}
+
+# readiness: 503 se il pool è esaurito o il database non risponde (in tempo)
+@router.get("/ready")
+def readiness_check():
+    result = get_readiness().get()
+    return JSONResponse(status_code=200 if result.ready else 503, content=result.as_dict())
+
+# metriche Prometheus (solo con token o dagli IP ammessi)
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
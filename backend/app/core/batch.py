@@ -0,0 +1,39 @@
+"""
+Stato condiviso tra le sotto-richieste di POST /api/batch.
+
+La rotta batch risolve utente e Session una volta sola e li mette in un ContextVar;
+get_db e get_current_user, se lo trovano, li riusano invece di aprire una nuova
+Session e decodificare di nuovo il token. Fuori da una batch il ContextVar è None
+e tutto funziona come prima.
+"""
+from __future__ import annotations
+
+import contextvars
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy.orm import Session
+
+
+@dataclass
+class BatchContext:
+    db: Session
+    user: Any      # app.models.User (niente import: i modelli importano app.db)
+    token: str     # il token con cui è stato risolto 'user'
+
+
+_current_batch: contextvars.ContextVar[Optional[BatchContext]] = contextvars.ContextVar(
+    "current_batch", default=None
+)
+
+
+def current_batch() -> Optional[BatchContext]:
+    return _current_batch.get()
+
+
+def enter_batch(ctx: BatchContext) -> contextvars.Token:
+    return _current_batch.set(ctx)
+
+
+def exit_batch(token: contextvars.Token) -> None:
+    _current_batch.reset(token)
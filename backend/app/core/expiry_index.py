@@ -0,0 +1,336 @@
+"""
+Indice in memoria degli item in scadenza, per le suggestioni "usalo prima".
+
+Per ogni casa teniamo:
+- gli item con una data di scadenza (id -> IndexedItem)
+- un indice invertito categoria -> item (le combinazioni di /suggestions)
+
+L'indice di una casa viene caricato dal DB alla prima richiesta (una query) e poi
+aggiornato in modo incrementale dagli eventi della Session: ogni commit che tocca
+degli InventoryItem aggiorna/rimuove solo quegli item; un commit che modifica un
+Product invalida le case che ne hanno in memoria nome e categoria.
+Ogni worker ha il suo indice: il TTL fa da rete di sicurezza per le scritture
+fatte da altri processi.
+
+- Ogni casa ha un numero di versione che cresce a ogni commit che la tocca: un
+  caricamento dal DB che si è incrociato con un commit viene scartato e rifatto,
+  altrimenti sovrascriverebbe la modifica con una fotografia più vecchia.
+- Teniamo al massimo INDEX_MAX_HOUSEHOLDS case (LRU): le altre vengono tolte dalla
+  memoria e ricaricate quando servono.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.inventory_item import InventoryItem
+from app.models.product import UNCATEGORIZED, Product
+
+# Colonne di Product copiate nell'indice
+_PRODUCT_COLUMNS = ("name", "category")
+
+# Dopo quanti secondi ricarichiamo comunque una casa dal DB
+INDEX_TTL_SECONDS = 300
+
+# Case tenute in memoria per worker (le meno usate di recente escono per prime)
+INDEX_MAX_HOUSEHOLDS = 10_000
+
+# Tentativi di caricamento prima di arrendersi a un commit concorrente
+LOAD_ATTEMPTS = 3
+
+# Peso della posizione: in frigo le cose vanno a male prima che in dispensa
+LOCATION_WEIGHTS = {"fridge": 1.0, "pantry": 0.8, "freezer": 0.3}
+
+# Item scaduti da più giorni di così: quasi certamente da buttare, non li suggeriamo
+EXPIRED_MAX_DAYS = 3
+
+
+@dataclass
+class IndexedItem:
+    """Copia leggera di un InventoryItem (niente oggetti ORM nell'indice)."""
+    id: int
+    household_id: int
+    product_id: int
+    product_name: str
+    category: str
+    quantity: int
+    unit: str
+    location: str
+    expires_at: date
+
+
+@dataclass
+class ScoredItem:
+    item: IndexedItem
+    days_left: int
+    score: float
+
+
+class ExpiryIndex:
+    def __init__(self, ttl_seconds: float = INDEX_TTL_SECONDS,
+                 max_households: int = INDEX_MAX_HOUSEHOLDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_households = max_households
+        self._lock = threading.Lock()
+        self._items: Dict[int, Dict[int, IndexedItem]] = {}
+        self._by_category: Dict[int, Dict[str, Set[int]]] = {}
+        # case in memoria -> istante del caricamento, in ordine LRU
+        # (-inf: in memoria e aggiornata dagli eventi, ma da ricaricare alla prossima lettura)
+        self._loaded_at: "OrderedDict[int, float]" = OrderedDict()
+        # household_id -> versione, cresce a ogni commit che tocca la casa
+        # (solo per le case in memoria o in caricamento, così non cresce all'infinito)
+        self._versions: Dict[int, int] = {}
+        # household_id -> caricamenti dal DB in corso
+        self._loading: Dict[int, int] = {}
+        # item_id -> household_id, per trovare subito un item che cambia
+        self._household_of: Dict[int, int] = {}
+        # catalogo per casa: household_id -> product_id -> (nome, categoria)
+        self._products: Dict[int, Dict[int, Tuple[str, str]]] = {}
+
+    # ---- caricamento e aggiornamenti ----
+
+    def _is_fresh(self, household_id: int) -> bool:
+        loaded = self._loaded_at.get(household_id)
+        return loaded is not None and time.monotonic() - loaded < self.ttl_seconds
+
+    def ensure_loaded(self, db: Session, household_id: int) -> None:
+        """Carica la casa dal DB se non è in memoria (o se è scaduto il TTL)."""
+        for attempt in range(LOAD_ATTEMPTS):
+            with self._lock:
+                if self._is_fresh(household_id):
+                    self._loaded_at.move_to_end(household_id)
+                    return
+                version = self._versions.get(household_id, 0)
+                self._loading[household_id] = self._loading.get(household_id, 0) + 1
+
+            try:
+                rows = (
+                    db.query(InventoryItem, Product.name, Product.category)
+                    .join(Product, Product.id == InventoryItem.product_id)
+                    .filter(
+                        InventoryItem.household_id == household_id,
+                        InventoryItem.expires_at.isnot(None),
+                    )
+                    .all()
+                )
+            finally:
+                with self._lock:
+                    self._loading[household_id] -= 1
+                    if not self._loading[household_id]:
+                        del self._loading[household_id]
+
+            with self._lock:
+                raced = self._versions.get(household_id, 0) != version
+                if raced and attempt < LOAD_ATTEMPTS - 1:
+                    # un commit è arrivato durante la query: la fotografia può essere vecchia
+                    continue
+                self._drop(household_id)
+                self._items[household_id] = {}
+                self._by_category[household_id] = {}
+                products = self._products[household_id] = {}
+                for item, name, category in rows:
+                    products[item.product_id] = (name, category or UNCATEGORIZED)
+                    self._add(self._snapshot(item))
+                # se ha perso tutte le corse la usiamo per questa richiesta, ma la
+                # prossima lettura la ricarica
+                self._loaded_at[household_id] = float("-inf") if raced else time.monotonic()
+                self._evict()
+                return
+
+    def _bump(self, household_id: int) -> None:
+        """Un commit ha toccato la casa: conta solo se è in memoria o in caricamento."""
+        if household_id in self._loaded_at or household_id in self._loading:
+            self._versions[household_id] = self._versions.get(household_id, 0) + 1
+
+    def _drop(self, household_id: int) -> None:
+        """Toglie una casa dalla memoria (la versione resta finché qualcuno la carica)."""
+        for item_id in self._items.pop(household_id, {}):
+            self._household_of.pop(item_id, None)
+        self._by_category.pop(household_id, None)
+        self._products.pop(household_id, None)
+        self._loaded_at.pop(household_id, None)
+        if household_id not in self._loading:
+            self._versions.pop(household_id, None)
+
+    def _evict(self) -> None:
+        while len(self._loaded_at) > self.max_households:
+            self._drop(next(iter(self._loaded_at)))
+
+    def _snapshot(self, item: InventoryItem) -> IndexedItem:
+        name, category = self._products[item.household_id][item.product_id]
+        return IndexedItem(
+            id=item.id,
+            household_id=item.household_id,
+            product_id=item.product_id,
+            product_name=name,
+            category=category,
+            quantity=item.quantity,
+            unit=item.unit,
+            location=item.location,
+            expires_at=item.expires_at,
+        )
+
+    def _add(self, entry: IndexedItem) -> None:
+        hh = entry.household_id
+        self._items[hh][entry.id] = entry
+        self._household_of[entry.id] = hh
+        self._by_category[hh].setdefault(entry.category, set()).add(entry.id)
+
+    def _remove(self, household_id: int, item_id: int) -> None:
+        entry = self._items.get(household_id, {}).pop(item_id, None)
+        if entry is None:
+            return
+        self._household_of.pop(item_id, None)
+        self._by_category[household_id].get(entry.category, set()).discard(item_id)
+
+    def invalidate(self, household_id: int) -> None:
+        """La casa verrà ricaricata dal DB alla prossima richiesta."""
+        with self._lock:
+            self._bump(household_id)
+            self._drop(household_id)
+
+    def invalidate_products(self, product_ids: Set[int]) -> None:
+        """Nome o categoria di questi prodotti sono cambiati: ricarichiamo le case che li usano."""
+        with self._lock:
+            stale = [
+                hh for hh, products in self._products.items()
+                if not product_ids.isdisjoint(products)
+            ]
+            for hh in stale:
+                self._bump(hh)
+                self._drop(hh)
+
+    def apply_changes(self, upserted: List[dict], deleted: List[Tuple[int, int]]) -> None:
+        """
+        Applica le modifiche di un commit.
+        'upserted' sono i valori delle colonne degli item nuovi/modificati,
+        'deleted' le coppie (household_id, item_id) cancellate.
+        Le case non ancora caricate vengono ignorate (le leggeremo fresche dal DB),
+        ma la loro versione cresce: un caricamento in corso saprà di essere vecchio.
+        """
+        with self._lock:
+            touched = {hh for hh, _ in deleted} | {v["household_id"] for v in upserted}
+            touched |= {self._household_of[v["id"]] for v in upserted if v["id"] in self._household_of}
+            for hh in touched:
+                self._bump(hh)
+
+            for household_id, item_id in deleted:
+                if household_id in self._loaded_at:
+                    self._remove(household_id, item_id)
+
+            for values in upserted:
+                # l'item potrebbe aver cambiato casa/prodotto/scadenza: togliamo e rimettiamo
+                previous = self._household_of.get(values["id"])
+                if previous is not None:
+                    self._remove(previous, values["id"])
+                hh = values["household_id"]
+                if hh not in self._loaded_at or values["expires_at"] is None:
+                    continue
+                product = self._products[hh].get(values["product_id"])
+                if product is None:
+                    # prodotto mai visto in questa casa: più semplice ricaricarla
+                    self._drop(hh)
+                    continue
+                self._add(IndexedItem(
+                    product_name=product[0], category=product[1], **values
+                ))
+
+    # ---- lettura ----
+
+    def categories(self, household_id: int) -> Dict[str, Set[int]]:
+        """Indice invertito della casa: categoria -> id degli item (copia)."""
+        with self._lock:
+            by_category = self._by_category.get(household_id, {})
+            return {category: set(ids) for category, ids in by_category.items() if ids}
+
+    def score(
+        self, household_id: int, today: date, horizon_days: int
+    ) -> List[ScoredItem]:
+        """
+        Punteggio "usalo prima" di tutti gli item che scadono entro 'horizon_days'.
+        Calcolato in blocco con NumPy: score = peso_posizione / (1 + giorni_rimasti),
+        gli item scaduti da poco contano come giorni_rimasti = 0 (punteggio massimo);
+        quelli scaduti da più di EXPIRED_MAX_DAYS giorni sono esclusi.
+        """
+        with self._lock:
+            entries = list(self._items.get(household_id, {}).values())
+        if not entries:
+            return []
+
+        expires = np.array([e.expires_at for e in entries], dtype="datetime64[D]")
+        days_left = (expires - np.datetime64(today, "D")).astype(np.int64)
+        weights = np.array([LOCATION_WEIGHTS.get(e.location, 0.8) for e in entries])
+
+        mask = (days_left <= horizon_days) & (days_left >= -EXPIRED_MAX_DAYS)
+        scores = weights / (1.0 + np.clip(days_left, 0, None))
+        idx = np.flatnonzero(mask)
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+
+        return [
+            ScoredItem(item=entries[i], days_left=int(days_left[i]), score=float(scores[i]))
+            for i in idx
+        ]
+
+
+# Istanza unica per processo
+expiry_index = ExpiryIndex()
+
+
+# ---- aggancio agli eventi della Session: aggiornamento incrementale ----
+
+_COLUMNS = ("id", "household_id", "product_id", "quantity", "unit", "location", "expires_at")
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_product_changes(session: Session, flush_context, instances) -> None:
+    """Prodotti con nome o categoria modificati (dopo il flush la history è già azzerata)."""
+    products = session.info.setdefault("expiry_products", set())
+    for obj in session.dirty:
+        if isinstance(obj, Product) and session.is_modified(obj):
+            state = inspect(obj)
+            if any(state.attrs[c].history.has_changes() for c in _PRODUCT_COLUMNS):
+                products.add(obj.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_inventory_changes(session: Session, flush_context) -> None:
+    """Durante il flush annotiamo gli item toccati (i valori sono già definitivi)."""
+    upserted = session.info.setdefault("expiry_upserted", {})
+    deleted = session.info.setdefault("expiry_deleted", {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, InventoryItem):
+            upserted[obj.id] = {c: getattr(obj, c) for c in _COLUMNS}
+            deleted.pop(obj.id, None)
+    for obj in session.deleted:
+        if isinstance(obj, InventoryItem):
+            deleted[obj.id] = obj.household_id
+            upserted.pop(obj.id, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_inventory_changes(session: Session) -> None:
+    upserted = session.info.pop("expiry_upserted", {})
+    deleted = session.info.pop("expiry_deleted", {})
+    products = session.info.pop("expiry_products", set())
+    if products:
+        expiry_index.invalidate_products(products)
+    if upserted or deleted:
+        expiry_index.apply_changes(
+            list(upserted.values()),
+            [(hh, item_id) for item_id, hh in deleted.items()],
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_inventory_changes(session: Session) -> None:
+    session.info.pop("expiry_upserted", None)
+    session.info.pop("expiry_deleted", None)
+    session.info.pop("expiry_products", None)
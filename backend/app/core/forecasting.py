@@ -0,0 +1,161 @@
+"""
+Calcoli vettoriali (NumPy) per le previsioni di consumo.
+
+Qui non si tocca il DB: le funzioni ricevono colonne già lette (un array per colonna)
+e lavorano su tutte le coppie (casa, prodotto) insieme, senza loop Python per riga.
+Le usa app/jobs/consumption_forecast.py e le misura benchmarks/forecast_bench.py.
+"""
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+# Emivita della media mobile esponenziale: un consumo di 14 giorni fa pesa la metà
+HALF_LIFE_DAYS = 14.0
+
+# Quanti giorni di storico consideriamo
+WINDOW_DAYS = 90
+
+
+def pair_keys(household_id: np.ndarray, product_id: np.ndarray) -> np.ndarray:
+    """Una chiave int64 per coppia (casa, prodotto)."""
+    return (household_id.astype(np.int64) << 32) | product_id.astype(np.int64)
+
+
+def ewma_daily_rates(
+    pair: np.ndarray,
+    age_days: np.ndarray,
+    quantity: np.ndarray,
+    n_pairs: int,
+    half_life_days: float = HALF_LIFE_DAYS,
+    window_days: int = WINDOW_DAYS,
+) -> np.ndarray:
+    """
+    Consumo giornaliero medio (pesato esponenzialmente) per ogni coppia.
+    'pair' è il codice 0..n_pairs-1 della coppia, 'age_days' quanti giorni fa è avvenuto
+    il consumo. I giorni senza consumo contano come zero: per questo il denominatore
+    è la somma dei pesi di tutti i giorni della finestra, uguale per tutte le coppie.
+    """
+    mask = (age_days >= 0) & (age_days < window_days)
+    weights = 0.5 ** (age_days[mask] / half_life_days)
+    numerator = np.bincount(
+        pair[mask], weights=weights * quantity[mask], minlength=n_pairs
+    )
+    denominator = (0.5 ** (np.arange(window_days) / half_life_days)).sum()
+    return numerator / denominator
+
+
+def project_stock(
+    pair: np.ndarray,
+    quantity: np.ndarray,
+    days_left: np.ndarray,
+    rates: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Proiezione delle scorte, item per item, consumando prima quello che scade prima.
+    'days_left' è float: np.inf per gli item senza scadenza.
+
+    Ritorna, per ogni coppia che ha scorte:
+    (codici coppia, quantità totale, giorni alla prossima scadenza, spreco previsto).
+    Lo spreco previsto è la quantità che al ritmo attuale non si farà in tempo a usare.
+    """
+    if len(pair) == 0:
+        empty = np.empty(0)
+        return pair, empty, empty, empty
+
+    # ordiniamo per coppia e poi per scadenza
+    order = np.lexsort((days_left, pair))
+    p, q, d = pair[order], quantity[order].astype(float), days_left[order]
+
+    # somma cumulativa dentro ogni coppia (cumsum globale meno l'offset del gruppo)
+    starts = np.flatnonzero(np.r_[True, p[1:] != p[:-1]])
+    sizes = np.diff(np.r_[starts, len(p)])
+    cum = np.cumsum(q)
+    cum_in_pair = cum - np.repeat(cum[starts] - q[starts], sizes)
+
+    # quanto si riesce a consumare entro la scadenza di ogni item
+    finite = np.isfinite(d)
+    usable = np.where(finite, rates[p] * np.clip(np.where(finite, d, 0), 0, None), np.inf)
+    shortfall = np.clip(cum_in_pair - usable, 0, None)
+
+    stock = np.add.reduceat(q, starts)
+    next_expiry = np.minimum.reduceat(d, starts)
+    waste = np.maximum.reduceat(shortfall, starts)
+    return p[starts], stock, next_expiry, waste
+
+
+def days_until_empty(stock: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """Giorni prima di finire le scorte (np.inf se non si consuma)."""
+    return np.where(rates > 0, stock / np.where(rates > 0, rates, 1), np.inf)
+
+
+def build_forecasts(
+    cons_household_id: np.ndarray,
+    cons_product_id: np.ndarray,
+    cons_age_days: np.ndarray,
+    cons_quantity: np.ndarray,
+    inv_household_id: np.ndarray,
+    inv_product_id: np.ndarray,
+    inv_quantity: np.ndarray,
+    inv_days_left: np.ndarray,
+    cons_unit: np.ndarray | None = None,
+    inv_unit: np.ndarray | None = None,
+) -> dict:
+    """
+    Previsioni per tutte le terne (casa, prodotto, unità) presenti nei due input.
+    Consumi: uno per (terna, giorno); inventario: un item per riga.
+    Le unità sono codici interi (None = tutto nella stessa unità): quantità in unità
+    diverse non si sommano mai, "g" e "pz" dello stesso prodotto sono due previsioni.
+    Ritorna un dict di colonne; 'first_row' indica la prima riga di input della terna
+    (prima l'inventario, poi i consumi) per recuperare attributi come l'unità.
+    Le terne senza scorte e senza consumi recenti vengono scartate.
+    """
+    if cons_unit is None:
+        cons_unit = np.zeros(len(cons_household_id), dtype=np.int64)
+    if inv_unit is None:
+        inv_unit = np.zeros(len(inv_household_id), dtype=np.int64)
+
+    # prima le coppie (casa, prodotto) in codici densi, poi coppia * n_unità + unità
+    _, pair = np.unique(
+        np.concatenate([
+            pair_keys(inv_household_id, inv_product_id),
+            pair_keys(cons_household_id, cons_product_id),
+        ]),
+        return_inverse=True,
+    )
+    units = np.concatenate([inv_unit, cons_unit]).astype(np.int64)
+    n_units = int(units.max()) + 1 if len(units) else 1
+    keys, first_row, inverse = np.unique(
+        pair.reshape(-1).astype(np.int64) * n_units + units,
+        return_index=True, return_inverse=True,
+    )
+    inverse = inverse.reshape(-1)
+    n_pairs = len(keys)
+    n_inv = len(inv_household_id)
+    inv_pair, cons_pair = inverse[:n_inv], inverse[n_inv:]
+
+    rates = ewma_daily_rates(cons_pair, cons_age_days, cons_quantity, n_pairs)
+
+    stock = np.zeros(n_pairs)
+    next_expiry = np.full(n_pairs, np.inf)
+    waste = np.zeros(n_pairs)
+    pairs, pair_stock, pair_expiry, pair_waste = project_stock(
+        inv_pair, inv_quantity, inv_days_left, rates
+    )
+    stock[pairs] = pair_stock
+    next_expiry[pairs] = pair_expiry
+    waste[pairs] = pair_waste
+
+    keep = (stock > 0) | (rates > 0)
+    rows = first_row[keep]
+    return {
+        "household_id": np.concatenate([inv_household_id, cons_household_id])[rows].astype(np.int64),
+        "product_id": np.concatenate([inv_product_id, cons_product_id])[rows].astype(np.int64),
+        "first_row": first_row[keep],
+        "daily_rate": rates[keep],
+        "stock_quantity": stock[keep],
+        "days_until_empty": days_until_empty(stock[keep], rates[keep]),
+        "next_expiry_days": next_expiry[keep],
+        "expected_waste": waste[keep],
+    }
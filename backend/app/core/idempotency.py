@@ -0,0 +1,98 @@
+"""
+Chiavi di idempotenza per le rotte di scrittura.
+
+Il client manda un header "Idempotency-Key: <stringa casuale>"; se ripete la stessa
+richiesta (timeout, retry automatici) riceve la risposta salvata la prima volta.
+La risposta viene salvata nella stessa transazione del lavoro: o ci sono entrambi o nessuno.
+
+- Salviamo anche un hash del corpo: la stessa chiave con un corpo diverso (bug del
+  client che riusa la chiave) è un 422, non la risposta di un'altra richiesta.
+- Le chiavi valgono IDEMPOTENCY_TTL_HOURS ore: dopo vengono ignorate (e sovrascritte
+  se riusate) e app/jobs/idempotency_cleanup.py le cancella.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from fastapi import Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.idempotency_key import IdempotencyKey
+
+IDEMPOTENCY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+
+
+def expiry_cutoff(now: datetime | None = None) -> datetime:
+    """Le chiavi create prima di questo istante sono scadute."""
+    return (now or datetime.now(tz=timezone.utc)) - IDEMPOTENCY_TTL
+
+
+def get_idempotency_key(
+    idempotency_key: str | None = Header(default=None, max_length=64),
+) -> str | None:
+    """Dependency: legge l'header opzionale Idempotency-Key."""
+    return idempotency_key
+
+
+def request_scope(request: Request) -> str:
+    """Metodo + path: una chiave vale solo per la rotta su cui è stata usata."""
+    return f"{request.method} {request.url.path}"
+
+
+def request_hash(payload: Any) -> str:
+    """SHA-256 del corpo della richiesta (JSON canonico: chiavi ordinate)."""
+    canonical = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def replay(
+    db: Session, user_id: int, key: str, scope: str, body_hash: str
+) -> JSONResponse | None:
+    """Se la chiave è già stata usata, ritorna la risposta salvata (altrimenti None)."""
+    saved = db.get(IdempotencyKey, (user_id, key))
+    if saved is None or (saved.created_at and saved.created_at < expiry_cutoff()):
+        return None
+    # chiavi salvate prima dell'hash (request_hash NULL): controlliamo solo lo scope
+    if saved.scope != scope or (saved.request_hash and saved.request_hash != body_hash):
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key già usata per un'altra richiesta",
+        )
+    return JSONResponse(status_code=saved.status_code, content=saved.response)
+
+
+def store(
+    db: Session, user_id: int, key: str, scope: str, body_hash: str,
+    status_code: int, body: Any,
+) -> bool:
+    """
+    Salva la risposta (senza commit: lo fa la rotta insieme al resto).
+    Ritorna False se un'altra richiesta con la stessa chiave ci ha preceduto:
+    in quel caso la rotta deve fare rollback e restituire replay(...).
+    Una chiave scaduta (non ancora cancellata dal job) viene sovrascritta.
+    """
+    stmt = pg_insert(IdempotencyKey).values(
+        user_id=user_id,
+        key=key,
+        scope=scope,
+        request_hash=body_hash,
+        status_code=status_code,
+        response=jsonable_encoder(body),
+        created_at=datetime.now(tz=timezone.utc),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            c: stmt.excluded[c]
+            for c in ("scope", "request_hash", "status_code", "response", "created_at")
+        },
+        where=IdempotencyKey.created_at < expiry_cutoff(),
+    ).returning(IdempotencyKey.key)
+    return db.execute(stmt).first() is not None
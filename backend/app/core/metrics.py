@@ -0,0 +1,164 @@
+"""
+Metriche Prometheus del processo (GET /api/metrics, formato testo; serve
+METRICS_TOKEN o un IP in METRICS_ALLOWED_HOSTS, vedi app/api/routes.py).
+
+- fridly_http_request_duration_seconds: istogramma per metodo, rotta (il template,
+  es. /api/households/{household_id}, non il path con gli id) e status
+- fridly_http_requests_in_progress: richieste in corso
+- fridly_db_pool_*: connessioni del pool SQLAlchemy (lette al momento dello scrape;
+  solo per QueuePool, gli altri pool non hanno dimensione né overflow)
+- fridly_password_hashing_*: hash/verify pbkdf2 in corso e loro durata
+- fridly_threadpool_*: thread di anyio occupati e task in coda; le rotte sync
+  (e quindi l'hashing di register/login) aspettano qui quando il pool è pieno
+- fridly_singleflight_calls_total: letture coalescenti (app/core/singleflight.py),
+  role="leader" esegue il caricamento, role="follower" riusa quello di un altro.
+  Rapporto di coalescenza:
+    sum by (flight) (rate(fridly_singleflight_calls_total{role="follower"}[5m]))
+    / sum by (flight) (rate(fridly_singleflight_calls_total[5m]))
+
+Con più worker (uvicorn --workers N) ogni processo espone le sue metriche:
+Prometheus li va interrogati uno per uno (o si aggrega per istanza).
+"""
+from __future__ import annotations
+
+import time
+
+import anyio.to_thread
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Bucket in secondi: da 5 ms (lookup per PK) a 10 s (timeout del load balancer)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_DURATION = Histogram(
+    "fridly_http_request_duration_seconds",
+    "Durata delle richieste HTTP per rotta",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "fridly_http_requests_in_progress",
+    "Richieste HTTP in corso",
+)
+HASHING_IN_PROGRESS = Gauge(
+    "fridly_password_hashing_in_progress",
+    "Hash/verifiche di password in corso (pbkdf2, CPU bound)",
+)
+HASHING_DURATION = Histogram(
+    "fridly_password_hashing_seconds",
+    "Durata di hash/verifica di una password",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+THREADPOOL_BUSY = Gauge(
+    "fridly_threadpool_threads_busy",
+    "Thread del pool di anyio occupati (rotte e dependency sync)",
+)
+THREADPOOL_WAITING = Gauge(
+    "fridly_threadpool_tasks_waiting",
+    "Task sync in coda in attesa di un thread libero",
+)
+THREADPOOL_SIZE = Gauge(
+    "fridly_threadpool_size",
+    "Thread massimi del pool di anyio",
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "fridly_singleflight_calls_total",
+    "Chiamate alle letture coalescenti, per flight e ruolo (leader/follower)",
+    ["flight", "role"],
+)
+
+
+class PoolCollector:
+    """Legge lo stato del pool dell'engine a ogni scrape (niente contatori da tenere)."""
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+
+    def collect(self):
+        pool = self.engine.pool
+        if not isinstance(pool, QueuePool):
+            return []
+        size = GaugeMetricFamily("fridly_db_pool_size", "Connessioni fisse del pool")
+        checked_out = GaugeMetricFamily(
+            "fridly_db_pool_checked_out", "Connessioni in uso (prestate alle richieste)"
+        )
+        overflow = GaugeMetricFamily(
+            "fridly_db_pool_overflow", "Connessioni oltre pool_size (negativo: non ancora aperte)"
+        )
+        max_overflow = GaugeMetricFamily("fridly_db_pool_max_overflow", "Overflow massimo")
+        size.add_metric([], pool.size())
+        checked_out.add_metric([], pool.checkedout())
+        overflow.add_metric([], pool.overflow())
+        max_overflow.add_metric([], pool._max_overflow)
+        return [size, checked_out, overflow, max_overflow]
+
+
+_pool_collectors: dict[int, PoolCollector] = {}
+
+
+def register_pool(engine: Engine) -> None:
+    """Espone il pool dell'engine nelle metriche (una volta sola per engine)."""
+    if id(engine) not in _pool_collectors:
+        _pool_collectors[id(engine)] = collector = PoolCollector(engine)
+        REGISTRY.register(collector)
+
+
+def pool_saturated(engine: Engine) -> bool:
+    """
+    True se tutte le connessioni (overflow compreso) sono in uso.
+    Solo un QueuePool ha un limite: NullPool, StaticPool... non si saturano mai.
+    """
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return False
+    # max_overflow = -1 vuol dire overflow illimitato
+    if pool._max_overflow < 0:
+        return False
+    return pool.checkedout() >= pool.size() + pool._max_overflow
+
+
+def render() -> bytes:
+    """Metriche in formato testo; i valori del threadpool si leggono qui (event loop)."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    THREADPOOL_BUSY.set(stats.borrowed_tokens)
+    THREADPOOL_WAITING.set(stats.tasks_waiting)
+    THREADPOOL_SIZE.set(stats.total_tokens)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: richieste in corso e durata per rotta."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # se l'app esplode prima di rispondere
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # il router scrive la rotta trovata nello scope; 404 senza rotta -> un'etichetta sola
+            route = getattr(scope.get("route"), "path", None) or "<nessuna rotta>"
+            REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(
+                time.perf_counter() - started
+            )
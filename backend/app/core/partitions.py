@@ -0,0 +1,185 @@
+"""
+Gestione delle partizioni mensili (Postgres, PARTITION BY RANGE).
+
+Convenzione dei nomi: <tabella>_yYYYYmMM, es. consumption_events_y2025m11.
+Ogni partizione copre [primo giorno del mese, primo giorno del mese successivo).
+
+C'è anche una partizione DEFAULT (<tabella>_default): se il cron di
+migrations/scripts/partitions.py si ferma, gli insert ci finiscono dentro invece di
+fallire. Al giro successivo ensure_month_partitions sposta quelle righe nella
+partizione del loro mese; finché il cron è fermo la DEFAULT cresce e va tenuta d'occhio.
+
+Le partizioni vecchie si staccano con DETACH PARTITION ... CONCURRENTLY (fuori da una
+transazione): la tabella padre resta usabile, senza ACCESS EXCLUSIVE per tutto il giro.
+"""
+from __future__ import annotations
+
+import re
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+DEFAULT_TABLE = "consumption_events"
+PARTITION_KEY = "occurred_at"
+
+# Attesa massima per il lock breve che serve a staccare/riattaccare la DEFAULT
+DETACH_LOCK_TIMEOUT = "5s"
+
+
+def month_start(d: date) -> date:
+    """Primo giorno del mese di 'd'."""
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    """Primo giorno del mese che sta 'months' mesi dopo (o prima) di 'd'."""
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Nome della partizione che contiene il mese indicato."""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    """Nome della partizione DEFAULT (righe fuori da tutti i mesi creati)."""
+    return f"{table}_default"
+
+
+def ensure_default_partition(conn: Connection, table: str = DEFAULT_TABLE) -> str:
+    """Crea (se manca) la partizione DEFAULT della tabella."""
+    name = default_partition_name(table)
+    conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" DEFAULT'))
+    return name
+
+
+def _exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f'"{name}"'}).scalar()
+
+
+def ensure_month_partitions(
+    conn: Connection,
+    table: str = DEFAULT_TABLE,
+    start: date | None = None,
+    months_ahead: int = 3,
+) -> List[str]:
+    """
+    Crea (se mancano) le partizioni dal mese di 'start' fino a 'months_ahead' mesi dopo.
+    È idempotente: da lanciare periodicamente (cron) così gli insert trovano sempre
+    la partizione pronta e restano semplici append.
+    """
+    first = month_start(start or date.today())
+    default = default_partition_name(table)
+    has_default = _exists(conn, default)
+    created: List[str] = []
+    for i in range(months_ahead + 1):
+        lower = add_months(first, i)
+        upper = add_months(lower, 1)
+        name = partition_name(table, lower)
+        created.append(name)
+        if _exists(conn, name):
+            continue
+        bounds = f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        in_default = has_default and conn.execute(
+            text(
+                f'SELECT EXISTS (SELECT 1 FROM "{default}" '
+                f"WHERE {PARTITION_KEY} >= :lower AND {PARTITION_KEY} < :upper)"
+            ),
+            {"lower": lower, "upper": upper},
+        ).scalar()
+        if not in_default:
+            conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}'))
+            continue
+        # la DEFAULT ha già righe di questo mese (cron fermo): CREATE ... PARTITION OF
+        # fallirebbe, quindi le spostiamo in una tabella nuova e la attacchiamo
+        conn.execute(text(
+            f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        ))
+        conn.execute(
+            text(
+                f'WITH moved AS (DELETE FROM "{default}" '
+                f"WHERE {PARTITION_KEY} >= :lower AND {PARTITION_KEY} < :upper RETURNING *) "
+                f'INSERT INTO "{name}" SELECT * FROM moved'
+            ),
+            {"lower": lower, "upper": upper},
+        )
+        conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" {bounds}'))
+    return created
+
+
+def list_partitions(
+    conn: Connection, table: str = DEFAULT_TABLE, detach_pending: bool = False
+) -> List[str]:
+    """
+    Nomi delle partizioni attualmente attaccate alla tabella padre.
+    Con detach_pending=True solo quelle rimaste a metà di un DETACH ... CONCURRENTLY.
+    """
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent AND (NOT :pending OR i.inhdetachpending) "
+            "ORDER BY c.relname"
+        ),
+        {"parent": table, "pending": detach_pending},
+    )
+    return [r[0] for r in rows]
+
+
+def detach_partitions_before(
+    conn: Connection,
+    cutoff: date,
+    table: str = DEFAULT_TABLE,
+    archive_schema: str | None = None,
+) -> List[str]:
+    """
+    Stacca le partizioni dei mesi precedenti a 'cutoff'.
+    I dati non vengono cancellati: la partizione diventa una tabella normale e,
+    se 'archive_schema' è indicato, viene spostata in quello schema (es. "archive").
+
+    'conn' deve essere in autocommit (isolation_level="AUTOCOMMIT"): DETACH ... CONCURRENTLY
+    non gira dentro una transazione. Postgres non lo permette se esiste una partizione
+    DEFAULT, quindi la DEFAULT viene staccata per il tempo dei DETACH e poi riattaccata
+    (due lock brevi, con lock_timeout). Un DETACH interrotto a metà viene completato
+    con FINALIZE al giro successivo.
+    """
+    pattern = re.compile(rf"^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$")
+    limit = month_start(cutoff)
+    detached: List[str] = []
+
+    for name in list_partitions(conn, table, detach_pending=True):
+        conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}" FINALIZE'))
+
+    old = []
+    for name in list_partitions(conn, table):
+        match = pattern.match(name)
+        if match and date(int(match.group(1)), int(match.group(2)), 1) < limit:
+            old.append(name)
+    if not old:
+        return detached
+
+    if archive_schema:
+        conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"'))
+
+    default = default_partition_name(table)
+    has_default = default in list_partitions(conn, table)
+    conn.execute(text(f"SET lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+    try:
+        if has_default:
+            conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+        try:
+            for name in old:
+                conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}" CONCURRENTLY'))
+                if archive_schema:
+                    conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{archive_schema}"'))
+                detached.append(name)
+        finally:
+            if has_default:
+                conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+    finally:
+        conn.execute(text("RESET lock_timeout"))
+    return detached
@@ -0,0 +1,126 @@
+"""
+Readiness "profonda" per il load balancer (GET /api/ready).
+
+/api/health dice solo che il processo risponde (liveness). Qui controlliamo anche che
+il worker possa davvero servire richieste:
+- il pool di connessioni non è esaurito (altrimenti le richieste restano in coda)
+- il database risponde a un SELECT 1 entro READINESS_MAX_DB_MS
+
+Il risultato resta in cache READINESS_CACHE_SECONDS: con probe ogni secondo da più
+load balancer facciamo comunque al massimo una query ogni tanto. Se un controllo è
+già in corso, le altre probe ricevono l'ultimo risultato invece di accodarsi, ma
+solo finché è recente (ttl + READINESS_MAX_DB_MS): oltre, aspettano il controllo in
+corso al massimo READINESS_MAX_DB_MS e poi rispondono "non pronto".
+
+Il SELECT 1 usa un engine dedicato con una sola connessione e tempi massimi
+ovunque: attesa nel pool, connect_timeout e statement_timeout. Un database bloccato
+non tiene ferma la probe per i 30 secondi di pool_timeout dell'engine dell'app.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from app.core.metrics import pool_saturated
+
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+READINESS_MAX_DB_MS = float(os.getenv("READINESS_MAX_DB_MS", "500"))
+
+
+@dataclass
+class ReadinessResult:
+    ready: bool
+    db_latency_ms: Optional[float]
+    reason: Optional[str]
+    checked_at: float  # time.time() del controllo
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class ReadinessCheck:
+    def __init__(self, engine: Engine, ttl: float = READINESS_CACHE_SECONDS,
+                 max_db_ms: float = READINESS_MAX_DB_MS) -> None:
+        self.engine = engine
+        self.ttl = ttl
+        self.max_db_ms = max_db_ms
+        self._lock = threading.Lock()
+        self._last: Optional[ReadinessResult] = None
+        self._last_monotonic = float("-inf")
+        self._check_started: Optional[float] = None  # monotonic del controllo in corso
+        self._probe: Optional[Engine] = None
+
+    def get(self) -> ReadinessResult:
+        """Risultato in cache se ancora valido, altrimenti un nuovo controllo."""
+        if self._is_fresh():
+            return self._last
+        if not self._lock.acquire(blocking=False):
+            # un'altra probe sta già controllando
+            started = self._check_started
+            running_ms = (time.monotonic() - started) * 1000 if started is not None else 0.0
+            if running_ms > self.max_db_ms:
+                return self._not_ready(f"controllo del database in corso da {running_ms:.0f} ms")
+            age = time.monotonic() - self._last_monotonic
+            if self._last is not None and age < self.ttl + self.max_db_ms / 1000:
+                return self._last
+            # nessun risultato recente: aspettiamo il controllo in corso, non oltre max_db_ms
+            if not self._lock.acquire(timeout=(self.max_db_ms - running_ms) / 1000):
+                return self._not_ready("controllo del database in corso da troppo")
+        try:
+            if not self._is_fresh():
+                self._check_started = time.monotonic()
+                self._last = self._check()
+                self._last_monotonic = time.monotonic()
+            return self._last
+        finally:
+            self._check_started = None
+            self._lock.release()
+
+    def close(self) -> None:
+        """Chiude la connessione dedicata ai controlli."""
+        if self._probe is not None:
+            self._probe.dispose()
+
+    def _is_fresh(self) -> bool:
+        return self._last is not None and time.monotonic() - self._last_monotonic < self.ttl
+
+    def _not_ready(self, reason: str) -> ReadinessResult:
+        return ReadinessResult(False, None, reason, time.time())
+
+    def _probe_engine(self) -> Engine:
+        """Engine con una connessione sola e timeout brevi, solo per il SELECT 1."""
+        if self._probe is None:
+            self._probe = create_engine(
+                self.engine.url,
+                pool_size=1,
+                max_overflow=0,
+                pool_timeout=self.max_db_ms / 1000,
+                connect_args={
+                    # libpq accetta solo secondi interi (minimo effettivo 2)
+                    "connect_timeout": max(2, math.ceil(self.max_db_ms / 1000)),
+                    "options": f"-c statement_timeout={math.ceil(self.max_db_ms)}",
+                },
+            )
+        return self._probe
+
+    def _check(self) -> ReadinessResult:
+        if pool_saturated(self.engine):
+            # le richieste resterebbero in coda fino a pool_timeout
+            return self._not_ready("pool di connessioni esaurito")
+        started = time.perf_counter()
+        try:
+            with self._probe_engine().connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as exc:
+            return self._not_ready(f"database non raggiungibile: {exc.__class__.__name__}")
+        latency_ms = (time.perf_counter() - started) * 1000
+        if latency_ms > self.max_db_ms:
+            return ReadinessResult(False, latency_ms, "database lento", time.time())
+        return ReadinessResult(True, latency_ms, None, time.time())
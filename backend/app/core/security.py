@@ -4,6 +4,8 @@ from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import jwt
 
+from app.core.metrics import HASHING_DURATION, HASHING_IN_PROGRESS
+
 # Prendiamo i valori dal .env
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -22,7 +24,8 @@ def hash_password(password: str) -> str:
     Trasforma la password in un hash (impronta) usando pbkdf2_sha256.
     L'hash è una stringa che contiene anche info su algoritmo e parametri.
     """
-    return pwd_context.hash(password)
+    with HASHING_IN_PROGRESS.track_inprogress(), HASHING_DURATION.labels("hash").time():
+        return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -32,7 +35,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     - rifare il calcolo
     - confrontare in modo sicuro.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    with HASHING_IN_PROGRESS.track_inprogress(), HASHING_DURATION.labels("verify").time():
+        return pwd_context.verify(plain_password, hashed_password)
 
 def create_access_token(subject: str | int) -> str:
     """
@@ -0,0 +1,99 @@
+"""
+Single-flight: chiamate identiche e contemporanee condividono un solo caricamento.
+
+Quando più membri di una famiglia aprono l'app insieme (o un client ritenta a raffica)
+arrivano tante GET uguali nello stesso istante. La prima ("leader") esegue il
+caricamento; quelle che arrivano mentre è in corso ("follower") aspettano e ricevono
+lo stesso risultato (o una copia della stessa eccezione).
+
+- Non è una cache: finito il caricamento la chiave sparisce, la richiesta successiva
+  rilegge dal DB. Un follower può quindi vedere dati vecchi al massimo di un
+  caricamento (quello in corso quando è arrivato).
+- Dopo una scrittura la rotta chiama forget(scope) (dopo il commit): i caricamenti
+  in corso per quello scope (es. la casa) non accettano più follower, così chi ha
+  appena scritto non riceve una fotografia partita prima del suo commit.
+- Il risultato è condiviso tra richieste: deve essere già serializzato (schema
+  Pydantic), non un oggetto ORM legato alla Session del leader.
+- L'autorizzazione NON va dentro il caricamento: ogni chiamante la fa prima, per sé.
+- Pensato per le rotte sync (thread del pool di anyio): i follower bloccano il loro
+  thread con un Event finché il leader finisce.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.core.metrics import SINGLEFLIGHT_CALLS
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self, scope: Hashable) -> None:
+        self.scope = scope
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _copy_error(error: BaseException) -> BaseException:
+    """
+    Copia dell'eccezione del leader per un follower: rilanciare la stessa istanza da
+    più thread allungherebbe a ognuno il __traceback__ condiviso.
+    Niente __init__ (le eccezioni con argomenti obbligatori non si ricostruiscono).
+    """
+    cls = type(error)
+    clone = cls.__new__(cls, *error.args)
+    clone.args = error.args
+    clone.__dict__.update(error.__dict__)
+    return clone
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name  # etichetta "flight" nelle metriche
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T], scope: Hashable = None) -> T:
+        """
+        Esegue fn() oppure, se per 'key' è già in corso, ne aspetta il risultato.
+        'scope' raggruppa le chiavi per forget() (es. l'id della casa).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(scope)
+
+        if not leader:
+            SINGLEFLIGHT_CALLS.labels(self.name, "follower").inc()
+            call.done.wait()
+            if call.error is not None:
+                raise _copy_error(call.error) from call.error
+            return call.result
+
+        SINGLEFLIGHT_CALLS.labels(self.name, "leader").inc()
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                # dopo un forget() la chiave può già essere di un altro leader
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, scope: Hashable) -> None:
+        """
+        Da chiamare dopo il commit di una scrittura su 'scope': le chiamate che
+        arrivano da ora partono con un caricamento nuovo invece di agganciarsi a uno
+        iniziato prima del commit (i follower già in attesa ricevono quello).
+        """
+        with self._lock:
+            for key, call in list(self._calls.items()):
+                if call.scope == scope:
+                    del self._calls[key]
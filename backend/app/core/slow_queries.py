@@ -0,0 +1,355 @@
+"""
+Log delle query lente con EXPLAIN automatico.
+
+- Gli eventi dell'engine misurano ogni statement; registriamo solo quelli sopra
+  SLOW_QUERY_MS millisecondi (al posto di echo=True che stampa tutto).
+- Ogni query lenta viene raggruppata per "fingerprint" (SQL normalizzato) con
+  conteggio, percentili della durata, rotta di origine e parametri oscurati.
+- Il piano EXPLAIN (ANALYZE, BUFFERS) viene catturato in un thread a parte, al massimo
+  una volta ogni SLOW_QUERY_EXPLAIN_INTERVAL secondi per fingerprint e al massimo
+  SLOW_QUERY_EXPLAINS_PER_MINUTE volte al minuto in totale.
+  ANALYZE esegue davvero la query: lo facciamo solo per le SELECT che non prendono
+  lock sulle righe e chiamano solo funzioni note senza effetti (vedi can_analyze),
+  sempre in una transazione annullata; per tutte le altre usiamo EXPLAIN semplice.
+  La query viene preparata con plan_cache_mode = force_generic_plan: il piano
+  mostra $1, $2... al posto dei valori, che quindi non finiscono nel log.
+"""
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+from psycopg import sql as pg_sql
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+EXPLAIN_INTERVAL_SECONDS = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+EXPLAINS_PER_MINUTE = int(os.getenv("SLOW_QUERY_EXPLAINS_PER_MINUTE", "10"))
+
+# Durate tenute per fingerprint per calcolare i percentili
+SAMPLES_PER_FINGERPRINT = 1000
+
+# Execution option per escludere uno statement dal log (es. gli EXPLAIN stessi)
+SKIP_OPTION = "slow_query_log_skip"
+
+# Scope ASGI della richiesta in corso (la rotta viene risolta dopo, dal router)
+_current_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "slow_query_scope", default=None
+)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN\s*\((?:[^()]*)\)", re.I)
+_SPACES = re.compile(r"\s+")
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|INTO)\b", re.I)
+_ROW_LOCKS = re.compile(r"\bFOR\s+(UPDATE|NO\s+KEY\s+UPDATE|SHARE|KEY\s+SHARE)\b", re.I)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+# nome seguito da '(': chiamata di funzione (o parola chiave SQL con parentesi)
+_CALLS = re.compile(r'([\w."]+)\s*\(')
+
+# Funzioni che si possono eseguire con ANALYZE: solo lettura, nessun effetto
+# (niente advisory lock, nextval, set_config, funzioni definite dall'utente...)
+SAFE_FUNCTIONS = frozenset({
+    "count", "sum", "min", "max", "avg", "array_agg", "string_agg", "bool_and", "bool_or",
+    "coalesce", "nullif", "greatest", "least", "lower", "upper", "length", "trim",
+    "abs", "round", "floor", "ceil", "now", "date_trunc", "extract", "date_part",
+    "row_number", "rank", "dense_rank", "lag", "lead", "generate_series", "pg_sleep",
+})
+# Parole chiave che compaiono davanti a una parentesi
+_SQL_KEYWORDS = frozenset({
+    "select", "from", "where", "and", "or", "not", "in", "exists", "any", "all", "as",
+    "on", "using", "join", "values", "over", "filter", "within", "cast", "case", "when",
+    "then", "else", "with", "union", "intersect", "except", "lateral", "between", "is",
+    "partition", "by", "order", "group", "having", "distinct", "like", "ilike", "row",
+})
+# Segnaposto del driver psycopg: %(nome)s, %s e il % letterale scritto %%
+_PLACEHOLDERS = re.compile(r"%\((\w+)\)s|%s|%%")
+
+# Nome del prepared statement usato per gli EXPLAIN
+_PREPARED = "slow_query_explain"
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL senza letterali, con le liste IN (...) compattate e spazi uniformi."""
+    sql = _LITERALS.sub("?", statement)
+    sql = _IN_LISTS.sub("IN (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize_sql(statement).encode()).hexdigest()[:16]
+
+
+def redact(parameters: Any) -> Any:
+    """Tiene i nomi dei parametri, sostituisce i valori con il loro tipo."""
+    if isinstance(parameters, dict):
+        return {k: f"<{type(v).__name__}>" for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return [redact(parameters[0]), f"... {len(parameters)} righe"]
+        return [f"<{type(v).__name__}>" for v in parameters]
+    return None
+
+
+def can_analyze(statement: str) -> bool:
+    """
+    True se lo statement si può eseguire davvero con EXPLAIN ANALYZE: una SELECT
+    (anche con WITH) senza scritture, senza FOR UPDATE/SHARE e che chiama solo
+    funzioni in SAFE_FUNCTIONS. Nel dubbio False: basta l'EXPLAIN semplice.
+    """
+    sql = _STRINGS.sub("''", statement)
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return False
+    if _WRITES.search(sql) or _ROW_LOCKS.search(sql):
+        return False
+    return all(
+        name.lower() in SAFE_FUNCTIONS or name.lower() in _SQL_KEYWORDS
+        for name in _CALLS.findall(sql)
+    )
+
+
+def to_prepared(statement: str, parameters: Any) -> tuple:
+    """
+    Converte i segnaposto del driver in $1, $2... per PREPARE.
+    Ritorna lo statement e i valori nell'ordine dei segnaposto.
+    """
+    names: Dict[str, int] = {}
+    values: List[Any] = []
+    positional = iter(parameters or ())
+
+    def placeholder(match: re.Match) -> str:
+        token = match.group(0)
+        if token == "%%":
+            return "%"
+        if token == "%s":
+            values.append(next(positional))
+            return f"${len(values)}"
+        name = match.group(1)
+        if name not in names:
+            values.append(parameters[name])
+            names[name] = len(values)
+        return f"${names[name]}"
+
+    return _PLACEHOLDERS.sub(placeholder, statement), values
+
+
+def current_route() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return "<fuori da una richiesta>"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "?")
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+class _Entry:
+    """Statistiche di un fingerprint."""
+
+    def __init__(self, sql: str) -> None:
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.durations: Deque[float] = deque(maxlen=SAMPLES_PER_FINGERPRINT)
+        self.routes: Counter = Counter()
+        self.last_parameters: Any = None
+        self.last_seen: float = 0.0
+        self.plan: Optional[str] = None
+        self.plan_captured_at: Optional[float] = None
+        self.explain_requested_at: float = float("-inf")
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS) -> None:
+        self.threshold_ms = threshold_ms
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._explain_queue: "queue.Queue[tuple]" = queue.Queue(maxsize=100)
+        self._explain_times: Deque[float] = deque()
+        self._worker: Optional[threading.Thread] = None
+        self._engine: Optional[Engine] = None
+
+    # ---- aggancio all'engine ----
+
+    def install(self, engine: Engine) -> None:
+        """Registra gli eventi sull'engine e avvia il thread degli EXPLAIN."""
+        self._engine = engine
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        self._worker = threading.Thread(
+            target=self._explain_loop, name="slow-query-explain", daemon=True
+        )
+        self._worker.start()
+
+    # l'inizio sta sul contesto dello statement: se lo statement fallisce
+    # (after_cursor_execute non arriva) sparisce con lui
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context.slow_query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, "slow_query_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms < self.threshold_ms:
+            return
+        if context.execution_options.get(SKIP_OPTION):
+            return
+        self.record(statement, parameters, elapsed_ms, executemany)
+
+    # ---- registrazione ----
+
+    def record(self, statement: str, parameters: Any, elapsed_ms: float,
+               executemany: bool = False) -> None:
+        key = fingerprint(statement)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(normalize_sql(statement))
+            entry.count += 1
+            entry.total_ms += elapsed_ms
+            entry.max_ms = max(entry.max_ms, elapsed_ms)
+            entry.durations.append(elapsed_ms)
+            entry.routes[current_route()] += 1
+            entry.last_parameters = redact(parameters)
+            entry.last_seen = time.time()
+
+            wants_plan = (
+                not executemany
+                and now - entry.explain_requested_at >= EXPLAIN_INTERVAL_SECONDS
+                and self._take_explain_slot(now)
+            )
+            if wants_plan:
+                entry.explain_requested_at = now
+
+        if wants_plan:
+            try:
+                # i parametri veri servono solo all'EXPLAIN e non vengono salvati
+                self._explain_queue.put_nowait((key, statement, parameters))
+            except queue.Full:
+                pass
+
+    def _take_explain_slot(self, now: float) -> bool:
+        """Limite globale: al massimo EXPLAINS_PER_MINUTE EXPLAIN nell'ultimo minuto."""
+        while self._explain_times and now - self._explain_times[0] > 60:
+            self._explain_times.popleft()
+        if len(self._explain_times) >= EXPLAINS_PER_MINUTE:
+            return False
+        self._explain_times.append(now)
+        return True
+
+    # ---- EXPLAIN in background ----
+
+    def _explain_loop(self) -> None:
+        while True:
+            key, statement, parameters = self._explain_queue.get()
+            try:
+                plan = self._explain(statement, parameters)
+            except Exception as exc:  # il log non deve mai rompere niente
+                plan = f"EXPLAIN fallito: {exc}"
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.plan = plan
+                    entry.plan_captured_at = time.time()
+            self._explain_queue.task_done()
+
+    def _explain(self, statement: str, parameters: Any) -> str:
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if can_analyze(statement) else "EXPLAIN "
+        prepared_sql, values = to_prepared(statement, parameters)
+        with self._engine.connect() as conn:
+            conn = conn.execution_options(**{SKIP_OPTION: True})
+            prepared = False
+            try:
+                with conn.begin() as trans:
+                    conn.execute(text("SET LOCAL statement_timeout = '10s'"))
+                    conn.execute(text("SET LOCAL plan_cache_mode = force_generic_plan"))
+                    conn.exec_driver_sql(f"PREPARE {_PREPARED} AS {prepared_sql}")
+                    prepared = True
+                    # valori resi come letterali lato client: EXECUTE non accetta
+                    # parametri del protocollo esteso
+                    args = ""
+                    if values:
+                        dbapi_conn = conn.connection.dbapi_connection
+                        args = "(%s)" % pg_sql.SQL(", ").join(
+                            pg_sql.Literal(v) for v in values
+                        ).as_string(dbapi_conn)
+                    rows = conn.exec_driver_sql(f"{prefix}EXECUTE {_PREPARED}{args}").all()
+                    trans.rollback()
+            finally:
+                # i prepared statement sopravvivono al ROLLBACK
+                if prepared:
+                    conn.exec_driver_sql(f"DEALLOCATE {_PREPARED}")
+                    conn.rollback()
+        return "\n".join(r[0] for r in rows)
+
+    def wait_for_explains(self) -> None:
+        """Aspetta gli EXPLAIN in coda (utile nei test)."""
+        self._explain_queue.join()
+
+    # ---- lettura ----
+
+    def snapshot(self) -> List[dict]:
+        """Statistiche per fingerprint, dalla più costosa (tempo totale) alla meno."""
+        with self._lock:
+            entries = list(self._entries.items())
+            data = [
+                (key, e, np.array(e.durations), dict(e.routes.most_common(5)))
+                for key, e in entries
+            ]
+        result = []
+        for key, e, durations, routes in data:
+            p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+            result.append({
+                "fingerprint": key,
+                "sql": e.sql,
+                "count": e.count,
+                "total_ms": e.total_ms,
+                "mean_ms": e.total_ms / e.count,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": e.max_ms,
+                "routes": routes,
+                "last_parameters": e.last_parameters,
+                "last_seen": e.last_seen,
+                "plan": e.plan,
+                "plan_captured_at": e.plan_captured_at,
+            })
+        result.sort(key=lambda r: r["total_ms"], reverse=True)
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Istanza unica per processo (agganciata all'engine in app/db.py)
+slow_query_log = SlowQueryLog()
+
+
+class RouteContextMiddleware:
+    """Middleware ASGI: rende disponibile la richiesta corrente al log delle query."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
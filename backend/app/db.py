@@ -1,19 +1,22 @@
 from __future__ import annotations
 import os
+import threading
 from pathlib import Path
 from sqlalchemy import create_engine, MetaData
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from dotenv import load_dotenv, find_dotenv
-from typing import Generator
+from typing import Generator, Optional
 
-# Carica .env in modo robusto (per Alembic e runtime)
+from app.core import metrics
+from app.core.batch import current_batch
+from app.core.slow_queries import slow_query_log
+
+# Carica .env in modo robusto (per Alembic e runtime).
+# override=False: le variabili già impostate (shell, CI, test) vincono sul .env
 BASE_DIR = Path(__file__).resolve().parents[1]
 ENV_PATH = BASE_DIR / ".env"
-load_dotenv(dotenv_path=ENV_PATH, override=True) or load_dotenv(find_dotenv(), override=True)
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL non trovata: crea backend/.env con la stringa di connessione")
+load_dotenv(dotenv_path=ENV_PATH, override=False) or load_dotenv(find_dotenv(), override=False)
 
 # Naming convention utile per migrazioni pulite
 convention = {
@@ -28,17 +31,47 @@ metadata = MetaData(naming_convention=convention)
 # Base ORM
 Base = declarative_base(metadata=metadata)
 
-# Engine e factory delle Session
-engine = create_engine(DATABASE_URL, echo=True, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+# Factory delle Session: il bind lo aggiunge get_engine() alla prima connessione
+SessionLocal = sessionmaker(autoflush=False, autocommit=False, future=True)
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> Engine:
+    """
+    Engine dell'app, creato alla prima chiamata (non all'import: importare app.db,
+    es. nei test o negli script, non richiede un database né DATABASE_URL).
+    SQL_ECHO=1 stampa tutte le query (solo per debug); di norma registriamo solo
+    quelle lente, vedi app/core/slow_queries.py
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = os.getenv("DATABASE_URL")
+                if not url:
+                    raise RuntimeError(
+                        "DATABASE_URL non trovata: crea backend/.env con la stringa di connessione"
+                    )
+                engine = create_engine(url, echo=os.getenv("SQL_ECHO") == "1", future=True)
+                slow_query_log.install(engine)
+                metrics.register_pool(engine)
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
 
 def get_db() -> Generator[Session, None, None]:
     """
     Ritorna una Session SQLAlchemy per la durata della richiesta.
     - 'yield' consegna la sessione a FastAPI;
     - quando la richiesta finisce, il 'finally' chiude la sessione.
+    Dentro POST /api/batch tutte le sotto-richieste usano la Session della batch.
     """
-    db = SessionLocal()
+    batch = current_batch()
+    if batch is not None:
+        yield batch.db  # la chiude la richiesta batch
+        return
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
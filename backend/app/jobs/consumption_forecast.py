@@ -0,0 +1,201 @@
+"""
+Job notturno delle previsioni di consumo.
+
+Per blocchi di case (keyset su households.id):
+1. legge in forma colonnare i consumi degli ultimi WINDOW_DAYS giorni (dai rollup
+   giornalieri) e gli item dell'inventario
+2. calcola con NumPy, per tutte le terne (casa, prodotto, unità) del blocco insieme,
+   ritmo di consumo, data in cui finisce la scorta e spreco previsto
+   (come nei rollup, quantità in unità diverse non si sommano mai)
+3. scrive i risultati con un unico INSERT ... ON CONFLICT per blocco
+4. cancella le previsioni non più valide delle case del blocco
+
+Uso: python -m app.jobs.consumption_forecast   (es. da cron ogni notte)
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection
+
+from app.db import get_engine
+from app.core.forecasting import WINDOW_DAYS, build_forecasts
+from app.models.consumption_forecast import ConsumptionForecast
+from app.models.household import Household
+from app.models.inventory_item import InventoryItem
+from app.models.waste_rollup import WasteRollupDaily
+
+# Case elaborate per blocco (tutte le loro righe stanno in memoria insieme)
+HOUSEHOLDS_PER_CHUNK = 5_000
+
+# Oltre questi giorni una data prevista non ha senso (e potrebbe superare l'anno 9999)
+FORECAST_HORIZON_DAYS = 3 * 365
+
+
+def _columns(rows: Sequence, names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Righe del DB -> un array per colonna (vuoti se non ci sono righe)."""
+    if not rows:
+        return {name: np.empty(0, dtype=object) for name in names}
+    return {name: np.array(col) for name, col in zip(names, zip(*rows))}
+
+
+def _load_chunk(conn: Connection, lo: int, hi: int, today: date):
+    """Consumi e inventario delle case con id in [lo, hi]."""
+    r = WasteRollupDaily
+    consumption = conn.execute(
+        select(r.household_id, r.product_id, r.day, func.sum(r.quantity), r.unit)
+        .where(
+            r.household_id.between(lo, hi),
+            r.event_type == "consumed",
+            r.day > today - timedelta(days=WINDOW_DAYS),
+        )
+        .group_by(r.household_id, r.product_id, r.day, r.unit)
+    ).all()
+
+    i = InventoryItem
+    inventory = conn.execute(
+        select(i.household_id, i.product_id, i.quantity, i.expires_at, i.unit)
+        .where(i.household_id.between(lo, hi))
+    ).all()
+
+    return (
+        _columns(consumption, ("household_id", "product_id", "day", "quantity", "unit")),
+        _columns(inventory, ("household_id", "product_id", "quantity", "expires_at", "unit")),
+    )
+
+
+def _days_since(values: np.ndarray, today: date) -> np.ndarray:
+    return (np.datetime64(today, "D") - values.astype("datetime64[D]")).astype(np.int64)
+
+
+def _offset_dates(today: date, days: np.ndarray) -> List[date | None]:
+    """
+    today + giorni (arrotondati per difetto); None dove i giorni sono infiniti o
+    oltre FORECAST_HORIZON_DAYS.
+    """
+    ok = np.isfinite(days) & (days <= FORECAST_HORIZON_DAYS)
+    out = np.datetime64(today, "D") + np.where(ok, np.floor(days), 0).astype("timedelta64[D]")
+    return [d if keep else None for d, keep in zip(out.tolist(), ok.tolist())]
+
+
+def compute_chunk(cons: Dict[str, np.ndarray], inv: Dict[str, np.ndarray], today: date,
+                  computed_at: datetime) -> List[dict]:
+    """Colonne lette dal DB -> righe da scrivere in consumption_forecasts."""
+    # scadenza -> giorni mancanti (np.inf per gli item senza scadenza)
+    expires = inv["expires_at"]
+    has_expiry = np.array([e is not None for e in expires], dtype=bool)
+    days_left = np.full(len(expires), np.inf)
+    if has_expiry.any():
+        days_left[has_expiry] = -_days_since(expires[has_expiry], today)
+
+    # unità -> codici interi comuni ai due input
+    all_units = np.concatenate([inv["unit"], cons["unit"]]).astype(object)
+    _, unit_codes = np.unique(all_units.astype(str), return_inverse=True)
+    unit_codes = unit_codes.reshape(-1)
+    n_inv = len(inv["unit"])
+
+    f = build_forecasts(
+        cons["household_id"].astype(np.int64),
+        cons["product_id"].astype(np.int64),
+        _days_since(cons["day"], today) if len(cons["day"]) else np.empty(0, np.int64),
+        cons["quantity"].astype(float),
+        inv["household_id"].astype(np.int64),
+        inv["product_id"].astype(np.int64),
+        inv["quantity"].astype(float),
+        days_left,
+        cons_unit=unit_codes[n_inv:],
+        inv_unit=unit_codes[:n_inv],
+    )
+
+    units = all_units[f["first_row"]]
+    runs_out_on = _offset_dates(today, f["days_until_empty"])
+    next_expiry_on = _offset_dates(today, f["next_expiry_days"])
+
+    return [
+        {
+            "household_id": hh,
+            "product_id": prod,
+            "unit": unit,
+            "daily_rate": rate,
+            "stock_quantity": int(stock),
+            "runs_out_on": out_on,
+            "next_expiry_on": expiry_on,
+            "expected_waste": waste,
+            "will_expire_before_used": waste > 0,
+            "computed_at": computed_at,
+        }
+        for hh, prod, unit, rate, stock, out_on, expiry_on, waste in zip(
+            f["household_id"].tolist(), f["product_id"].tolist(), units.tolist(),
+            f["daily_rate"].tolist(), f["stock_quantity"].tolist(),
+            runs_out_on, next_expiry_on, f["expected_waste"].tolist(),
+        )
+    ]
+
+
+def _upsert(conn: Connection, rows: List[dict]) -> None:
+    if not rows:
+        return
+    table = ConsumptionForecast.__table__
+    stmt = pg_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["household_id", "product_id", "unit"],
+        set_={
+            c.name: stmt.excluded[c.name]
+            for c in table.columns if c.name not in ("household_id", "product_id", "unit")
+        },
+    )
+    conn.execute(stmt, rows)
+
+
+def run(conn: Connection, today: date | None = None,
+        households_per_chunk: int = HOUSEHOLDS_PER_CHUNK) -> int:
+    """
+    Ricalcola tutte le previsioni; ritorna quante righe ha scritto.
+    Fa commit dopo ogni blocco di case.
+    """
+    today = today or date.today()
+    computed_at = datetime.now(tz=timezone.utc)
+    written = 0
+    last_id = 0
+
+    while True:
+        ids = conn.execute(
+            select(Household.id)
+            .where(Household.id > last_id)
+            .order_by(Household.id)
+            .limit(households_per_chunk)
+        ).scalars().all()
+        if not ids:
+            break
+        lo, hi = ids[0], ids[-1]
+
+        cons, inv = _load_chunk(conn, lo, hi, today)
+        rows = compute_chunk(cons, inv, today, computed_at)
+        _upsert(conn, rows)
+
+        # le coppie non più presenti (scorte finite, nessun consumo recente) spariscono
+        conn.execute(
+            delete(ConsumptionForecast).where(
+                ConsumptionForecast.household_id.between(lo, hi),
+                ConsumptionForecast.computed_at < computed_at,
+            )
+        )
+        # un commit per blocco: niente transazioni lunghe su tutta la tabella
+        conn.commit()
+        written += len(rows)
+        last_id = hi
+    return written
+
+
+def main() -> None:
+    with get_engine().connect() as conn:
+        written = run(conn)
+    print(f"Previsioni ok: {written} righe scritte.")
+
+
+if __name__ == "__main__":
+    main()
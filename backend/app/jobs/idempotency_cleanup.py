@@ -0,0 +1,53 @@
+"""
+Pulizia delle Idempotency-Key scadute (più vecchie di IDEMPOTENCY_TTL_HOURS).
+
+Cancella a lotti piccoli, un commit per lotto: niente transazioni lunghe né lock
+su tutta la tabella mentre l'app continua a scriverci.
+Usa l'indice su created_at.
+
+Uso: python -m app.jobs.idempotency_cleanup   (es. da cron ogni ora)
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.engine import Connection
+
+from app.db import get_engine
+from app.core.idempotency import expiry_cutoff
+from app.models.idempotency_key import IdempotencyKey
+
+# Righe cancellate per lotto
+BATCH_SIZE = 5_000
+
+
+def run(conn: Connection, now: datetime | None = None, batch_size: int = BATCH_SIZE) -> int:
+    """Cancella le chiavi scadute; ritorna quante ne ha cancellate."""
+    cutoff = expiry_cutoff(now)
+    k = IdempotencyKey
+    batch = (
+        select(k.user_id, k.key)
+        .where(k.created_at < cutoff)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    deleted = 0
+    while True:
+        n = conn.execute(
+            delete(k).where(tuple_(k.user_id, k.key).in_(batch))
+        ).rowcount
+        conn.commit()
+        deleted += n
+        if n < batch_size:
+            return deleted
+
+
+def main() -> None:
+    with get_engine().connect() as conn:
+        deleted = run(conn)
+    print(f"Idempotency-Key scadute cancellate: {deleted}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Job incrementale dei rollup di consumption_events.
+
+Ad ogni esecuzione:
+1. legge il watermark (fin dove siamo arrivati la volta scorsa)
+2. legge in streaming, a blocchi colonnari, gli eventi nuovi
+3. aggrega ogni blocco con NumPy (niente loop Python riga per riga)
+4. somma i totali nei rollup giornalieri e mensili con INSERT ... ON CONFLICT
+5. sposta il watermark, tutto nella stessa transazione
+
+Il watermark non è su occurred_at (ora dell'app quando arriva la richiesta): una
+transazione che fa commit in ritardo, o un server con l'orologio indietro, scriverebbe
+sotto il watermark e quegli eventi non verrebbero mai contati. Ogni evento porta
+invece l'id della transazione che l'ha inserito (xact_id) e il job elabora gli eventi
+con xact_id sotto l'xmin del suo snapshot: tutte quelle transazioni sono già finite,
+quindi nessun evento può più comparire sotto il watermark. Una transazione lasciata
+aperta a lungo ferma l'xmin: i rollup restano indietro, ma non perdono eventi.
+
+Uso: python -m app.jobs.waste_rollup   (es. da cron ogni 5 minuti)
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sqlalchemy import Date, and_, cast, func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection
+
+from app.db import get_engine
+from app.models.consumption_event import ConsumptionEvent
+from app.models.product import UNCATEGORIZED, Product
+from app.models.waste_rollup import RollupWatermark, WasteRollupDaily, WasteRollupMonthly
+
+WATERMARK_NAME = "waste_rollups"
+
+# Chiave dell'advisory lock: un solo job di rollup alla volta
+LOCK_KEY = 802_601
+
+# Righe lette dal DB per ogni blocco
+CHUNK_SIZE = 50_000
+
+# Colonne che identificano una riga di rollup (oltre al periodo)
+KEY_COLUMNS = ("household_id", "product_id", "category", "event_type", "unit")
+
+
+def aggregate_batch(
+    columns: Dict[str, np.ndarray], period_column: str
+) -> List[dict]:
+    """
+    Raggruppa un blocco colonnare per (KEY_COLUMNS + periodo) e somma quantità ed eventi.
+    'columns' contiene un array per colonna, tutti della stessa lunghezza.
+    Ritorna le righe pronte per l'upsert.
+    """
+    n = len(columns["quantity"])
+    if n == 0:
+        return []
+
+    # ogni colonna chiave -> codici interi (np.unique funziona anche su stringhe/date)
+    group_keys = KEY_COLUMNS + (period_column,)
+    uniques = []
+    codes = np.empty((n, len(group_keys)), dtype=np.int64)
+    for j, name in enumerate(group_keys):
+        values, inverse = np.unique(columns[name], return_inverse=True)
+        uniques.append(values)
+        codes[:, j] = inverse.reshape(-1)
+
+    # gruppi = combinazioni distinte dei codici
+    groups, group_of_row = np.unique(codes, axis=0, return_inverse=True)
+    group_of_row = group_of_row.reshape(-1)
+    quantity = np.bincount(group_of_row, weights=columns["quantity"], minlength=len(groups))
+    events = np.bincount(group_of_row, minlength=len(groups))
+
+    rows: List[dict] = []
+    for g, group in enumerate(groups):
+        row = {name: uniques[j][group[j]].item() for j, name in enumerate(group_keys)}
+        row["quantity"] = int(quantity[g])
+        row["events"] = int(events[g])
+        rows.append(row)
+    return rows
+
+
+def _upsert(conn: Connection, model, period_column: str, rows: Sequence[dict]) -> None:
+    """Somma i nuovi totali a quelli già presenti (o crea la riga)."""
+    if not rows:
+        return
+    table = model.__table__
+    stmt = pg_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            "household_id", "product_id", "event_type", "unit", period_column
+        ],
+        set_={
+            "quantity": table.c.quantity + stmt.excluded.quantity,
+            "events": table.c.events + stmt.excluded.events,
+            "category": stmt.excluded.category,
+        },
+    )
+    conn.execute(stmt, list(rows))
+
+
+def _to_columns(chunk: Sequence) -> Dict[str, np.ndarray]:
+    """Righe del DB -> un array NumPy per colonna."""
+    household_id, product_id, category, event_type, unit, quantity, day = zip(*chunk)
+    day_arr = np.array(day, dtype="datetime64[D]")
+    return {
+        "household_id": np.array(household_id, dtype=np.int64),
+        "product_id": np.array(product_id, dtype=np.int64),
+        "category": np.array([c or UNCATEGORIZED for c in category], dtype=object).astype(str),
+        "event_type": np.array(event_type, dtype=str),
+        "unit": np.array(unit, dtype=str),
+        "quantity": np.array(quantity, dtype=np.int64),
+        "day": day_arr,
+        "month": day_arr.astype("datetime64[M]").astype("datetime64[D]"),
+    }
+
+
+def _pending_events(watermark, horizon: int):
+    """Condizione sugli eventi ancora da contare, dato il watermark salvato."""
+    event = ConsumptionEvent
+    finished = event.xact_id < horizon
+    if watermark is None:
+        # primo giro in assoluto: tutto quello che c'è
+        return or_(event.xact_id.is_(None), finished)
+    if watermark.processed_xact_id is None:
+        # primo giro dopo l'aggiunta di xact_id: gli eventi vecchi (xact_id NULL)
+        # oltre il watermark su occurred_at, più quelli nuovi
+        return or_(
+            and_(event.xact_id.is_(None), event.occurred_at >= watermark.processed_until),
+            finished,
+        )
+    return and_(event.xact_id >= watermark.processed_xact_id, finished)
+
+
+def run(conn: Connection, now: datetime | None = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Elabora gli eventi nuovi e ritorna quanti ne ha aggregati.
+    Va chiamata dentro una transazione (es. engine.begin()).
+    """
+    now = now or datetime.now(tz=timezone.utc)
+
+    # due job in parallelo non devono contare due volte gli stessi eventi
+    conn.execute(select(func.pg_advisory_xact_lock(LOCK_KEY)))
+    # transazioni con id minore di horizon: tutte finite (commit o rollback)
+    horizon = conn.execute(
+        text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+    ).scalar()
+    watermark = conn.execute(
+        select(RollupWatermark.processed_xact_id, RollupWatermark.processed_until)
+        .where(RollupWatermark.name == WATERMARK_NAME)
+    ).first()
+    if watermark is not None and (watermark.processed_xact_id or 0) >= horizon:
+        return 0
+
+    event = ConsumptionEvent
+    day = cast(func.timezone("UTC", event.occurred_at), Date)
+    stmt = (
+        select(
+            event.household_id, event.product_id, Product.category,
+            event.event_type, event.unit, event.quantity, day,
+        )
+        .join(Product, Product.id == event.product_id)
+        .where(_pending_events(watermark, horizon))
+    )
+
+    processed = 0
+    # stream sul singolo statement: gli upsert intanto girano sulla stessa connessione
+    result = conn.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+    for chunk in result.partitions(chunk_size):
+        columns = _to_columns(chunk)
+        _upsert(conn, WasteRollupDaily, "day", aggregate_batch(columns, "day"))
+        _upsert(conn, WasteRollupMonthly, "month", aggregate_batch(columns, "month"))
+        processed += len(chunk)
+
+    values = {"processed_xact_id": horizon, "processed_until": now}
+    watermark_upsert = pg_insert(RollupWatermark.__table__).values(name=WATERMARK_NAME, **values)
+    conn.execute(watermark_upsert.on_conflict_do_update(index_elements=["name"], set_=values))
+    return processed
+
+
+def main() -> None:
+    with get_engine().begin() as conn:
+        processed = run(conn)
+    print(f"Rollup ok: {processed} eventi aggregati.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,28 @@
 from fastapi import FastAPI
 
+from app.core.metrics import MetricsMiddleware
+from app.core.slow_queries import RouteContextMiddleware
+
 app = FastAPI()
+app.add_middleware(RouteContextMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 from app import models  # noqa: F401
 from app.api.routes import router as health_router
 from app.api.auth import router as auth_router
 from app.api.households import router as household_router  # <--- nuovo
+from app.api.inventory import router as inventory_router
+from app.api.analytics import router as analytics_router
+from app.api.admin import router as admin_router
+from app.api.batch import router as batch_router
 
 app.include_router(health_router, prefix="/api")
 app.include_router(auth_router)
 app.include_router(household_router)  # <--- nuovo
+app.include_router(inventory_router)
+app.include_router(analytics_router)
+app.include_router(admin_router)
+app.include_router(batch_router)
 
 @app.get("/")
 def read_root():
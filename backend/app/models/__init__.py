@@ -3,5 +3,13 @@ from .household import Household
 from .household_member import HouseholdMember
 from .product import Product
 from .inventory_item import InventoryItem  # <-- underscore, nessuno spazio!
+from .consumption_event import ConsumptionEvent
+from .waste_rollup import WasteRollupDaily, WasteRollupMonthly, RollupWatermark
+from .consumption_forecast import ConsumptionForecast
+from .idempotency_key import IdempotencyKey
 
-__all__ = ["User", "Household", "HouseholdMember", "Product", "InventoryItem"]
+__all__ = [
+    "User", "Household", "HouseholdMember", "Product", "InventoryItem", "ConsumptionEvent",
+    "WasteRollupDaily", "WasteRollupMonthly", "RollupWatermark", "ConsumptionForecast",
+    "IdempotencyKey",
+]
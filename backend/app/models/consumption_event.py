@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, Integer, String, DateTime, ForeignKey, Index, CheckConstraint
+from sqlalchemy.sql import func, text
+
+from app.db import Base
+
+# Tipi di evento ammessi (cosa è successo al cibo)
+EVENT_TYPES = ("consumed", "wasted", "expired")
+
+
+class ConsumptionEvent(Base):
+    """
+    Storico append-only di cosa succede agli item dell'inventario:
+    consumato, buttato o scaduto.
+    La tabella è partizionata per mese su occurred_at (vedi app/core/partitions.py),
+    così le partizioni vecchie si possono staccare/archiviare senza toccare le nuove.
+    """
+    __tablename__ = "consumption_events"
+
+    # In Postgres la PK di una tabella partizionata deve includere la chiave di partizione
+    __table_args__ = (
+        CheckConstraint(
+            "event_type IN ('consumed', 'wasted', 'expired')", name="event_type"
+        ),
+        Index("ix_consumption_events_household_id_occurred_at", "household_id", "occurred_at"),
+        Index("ix_consumption_events_xact_id", "xact_id"),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+    # Chiave primaria composta (id + timestamp di partizione);
+    # BIGSERIAL: log append-only ad alto volume, un int4 si esaurirebbe
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    occurred_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, server_default=func.now()
+    )
+
+    # Household e prodotto coinvolti
+    household_id: Mapped[int] = mapped_column(
+        ForeignKey("households.id", ondelete="CASCADE")
+    )
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="RESTRICT"), index=True
+    )
+
+    # Item di origine: niente FK, l'item può essere cancellato quando finisce
+    inventory_item_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # consumed / wasted / expired
+    event_type: Mapped[str] = mapped_column(String(16))
+
+    # Quantità e unità, stesse convenzioni di InventoryItem
+    quantity: Mapped[int] = mapped_column(Integer)
+    unit: Mapped[str] = mapped_column(String(8), default="pz")
+
+    # Transazione che ha inserito l'evento (pg_current_xact_id), per il watermark dei
+    # rollup: NULL solo per gli eventi precedenti alla colonna
+    xact_id: Mapped[int | None] = mapped_column(
+        BigInteger, server_default=text("(pg_current_xact_id())::text::bigint"), nullable=True
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<ConsumptionEvent id={self.id} hh={self.household_id} "
+            f"prod={self.product_id} type={self.event_type} qty={self.quantity}>"
+        )
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Boolean, Date, DateTime, Float, ForeignKey, Integer, String
+
+from app.db import Base
+
+
+class ConsumptionForecast(Base):
+    """
+    Previsione per terna (casa, prodotto, unità), ricalcolata ogni notte
+    da app/jobs/consumption_forecast.py. L'unità fa parte della chiave: un prodotto
+    registrato sia in "g" sia in "pz" ha due previsioni separate.
+    """
+    __tablename__ = "consumption_forecasts"
+
+    household_id: Mapped[int] = mapped_column(
+        ForeignKey("households.id", ondelete="CASCADE"), primary_key=True
+    )
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    unit: Mapped[str] = mapped_column(String(8), primary_key=True, default="pz")
+
+    # Consumo medio giornaliero (media mobile esponenziale)
+    daily_rate: Mapped[float] = mapped_column(Float)
+
+    # Scorte attuali e proiezione "quando finisce"
+    stock_quantity: Mapped[int] = mapped_column(Integer)
+    runs_out_on: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+    # Prossima scadenza e quantità che probabilmente scadrà prima di essere usata
+    next_expiry_on: Mapped[date | None] = mapped_column(Date, nullable=True)
+    expected_waste: Mapped[float] = mapped_column(Float, default=0.0)
+    will_expire_before_used: Mapped[bool] = mapped_column(Boolean, default=False)
+
+    computed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    def __repr__(self) -> str:
+        return (
+            f"<ConsumptionForecast hh={self.household_id} prod={self.product_id} "
+            f"rate={self.daily_rate}>"
+        )
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import JSON, DateTime, ForeignKey, Integer, String
+from sqlalchemy.sql import func
+
+from app.db import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Risposta già data a una richiesta con header Idempotency-Key.
+    Se il client (es. mobile su rete instabile) ripete la richiesta con la stessa chiave,
+    restituiamo la stessa risposta senza rifare il lavoro.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # La chiave è unica per utente: due utenti possono usare la stessa stringa
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    # Metodo + path della richiesta originale (la chiave non vale per altre rotte)
+    scope: Mapped[str] = mapped_column(String(255))
+
+    # SHA-256 del corpo della richiesta originale (stessa chiave, corpo diverso -> 422)
+    request_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
+    # Risposta salvata
+    status_code: Mapped[int] = mapped_column(Integer)
+    response: Mapped[Any] = mapped_column(JSON)
+
+    # Dopo IDEMPOTENCY_TTL_HOURS la chiave scade (vedi app/jobs/idempotency_cleanup.py)
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyKey user={self.user_id} key={self.key} scope={self.scope}>"
@@ -10,6 +10,9 @@ from sqlalchemy.sql import func
 
 from app.db import Base
 
+# Categoria usata quando il prodotto non ne ha una (rollup, suggerimenti...)
+UNCATEGORIZED = "uncategorized"
+
 
 class Product(Base):
     """Catalogo generale dei prodotti (es. Pasta 500g, Latte 1L)."""
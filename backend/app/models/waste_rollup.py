@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, Integer, String, Date, DateTime, ForeignKey, Index
+
+from app.db import Base
+# anche qui: serve un valore non NULL nella PK dei rollup
+from app.models.product import UNCATEGORIZED  # noqa: F401
+
+
+class _WasteRollupColumns:
+    """
+    Colonne comuni ai rollup giornalieri e mensili.
+    Una riga = totale degli eventi di un prodotto in una casa, per tipo evento e unità,
+    nel periodo indicato. La categoria è copiata dal prodotto per raggruppare senza JOIN.
+    """
+    household_id: Mapped[int] = mapped_column(
+        ForeignKey("households.id", ondelete="CASCADE"), primary_key=True
+    )
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    event_type: Mapped[str] = mapped_column(String(16), primary_key=True)
+    unit: Mapped[str] = mapped_column(String(8), primary_key=True)
+    category: Mapped[str] = mapped_column(String(120), default=UNCATEGORIZED)
+
+    # Totale quantità e numero di eventi aggregati
+    quantity: Mapped[int] = mapped_column(BigInteger, default=0)
+    events: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class WasteRollupDaily(_WasteRollupColumns, Base):
+    """Aggregato giornaliero (giorno UTC) di consumption_events."""
+    __tablename__ = "waste_rollups_daily"
+    __table_args__ = (
+        Index("ix_waste_rollups_daily_household_id_day", "household_id", "day"),
+    )
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    def __repr__(self) -> str:
+        return f"<WasteRollupDaily hh={self.household_id} day={self.day} prod={self.product_id}>"
+
+
+class WasteRollupMonthly(_WasteRollupColumns, Base):
+    """Aggregato mensile: 'month' è il primo giorno del mese (UTC)."""
+    __tablename__ = "waste_rollups_monthly"
+    __table_args__ = (
+        Index("ix_waste_rollups_monthly_household_id_month", "household_id", "month"),
+    )
+
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    def __repr__(self) -> str:
+        return f"<WasteRollupMonthly hh={self.household_id} month={self.month} prod={self.product_id}>"
+
+
+class RollupWatermark(Base):
+    """
+    Fin dove il job dei rollup ha già elaborato gli eventi.
+    Aggiornato nella stessa transazione degli upsert: ogni evento viene contato una volta sola.
+    - processed_xact_id: eventi con xact_id minore sono già contati (vedi app/jobs/waste_rollup.py)
+    - processed_until: ora dell'ultimo giro; prima di xact_id era il watermark su occurred_at
+    """
+    __tablename__ = "rollup_watermarks"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    processed_until: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    processed_xact_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"<RollupWatermark name={self.name} xact={self.processed_xact_id} "
+            f"until={self.processed_until}>"
+        )
@@ -0,0 +1,19 @@
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+# Statistiche di un gruppo di query lente con lo stesso SQL normalizzato.
+class SlowQueryOut(BaseModel):
+    fingerprint: str
+    sql: str                       # SQL normalizzato (senza valori)
+    count: int
+    total_ms: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    routes: Dict[str, int]         # rotte che l'hanno generata (top 5)
+    last_parameters: Any           # solo nomi e tipi, mai i valori
+    last_seen: float               # timestamp unix
+    plan: Optional[str]            # EXPLAIN (ANALYZE, BUFFERS), se già catturato
+    plan_captured_at: Optional[float]
@@ -0,0 +1,29 @@
+from datetime import date
+from typing import Optional
+from pydantic import BaseModel
+
+# Totale di un mese per categoria (es. grafico "kg buttati al mese per categoria").
+class CategoryMonthTotal(BaseModel):
+    month: date          # primo giorno del mese
+    category: str
+    unit: str            # le quantità si sommano solo a parità di unità (g, ml, pz...)
+    quantity: int
+    events: int
+
+# Un prodotto nella classifica dei "più sprecati".
+class ProductWasteTotal(BaseModel):
+    product_id: int
+    name: str
+    category: Optional[str]
+    unit: str
+    quantity: int
+    events: int
+
+# Totale piattaforma per mese e tipo di evento (nessun dato per-casa).
+class PlatformMonthTotal(BaseModel):
+    month: date
+    event_type: str
+    unit: str
+    quantity: int
+    events: int
+    households: int      # quante case hanno almeno un evento in quel mese
@@ -0,0 +1,25 @@
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+# Numero massimo di sotto-richieste in una batch
+MAX_BATCH_REQUESTS = 20
+
+# Una sotto-richiesta: come una chiamata HTTP normale, ma dentro il payload.
+class SubRequest(BaseModel):
+    id: Optional[str] = None            # scelto dal client, torna uguale nella risposta
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str                           # es. "/api/households/3?x=1" (solo /api/...)
+    body: Optional[Any] = None          # corpo JSON (per POST/PUT/PATCH)
+    headers: Dict[str, str] = {}        # header extra (es. Idempotency-Key); non Authorization
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest] = Field(min_length=1, max_length=MAX_BATCH_REQUESTS)
+
+# Risposta di una sotto-richiesta, nello stesso ordine della richiesta.
+class SubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int                         # status code HTTP della sotto-richiesta
+    body: Optional[Any] = None          # JSON decodificato (o testo se non è JSON)
+
+class BatchResponse(BaseModel):
+    responses: List[SubResponse]
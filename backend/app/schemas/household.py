@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr, ConfigDict
 
 # Questo schema rappresenta i dati necessari per CREARE una nuova casa.
@@ -20,15 +20,25 @@ class HouseholdOut(BaseModel):
     name: str                           # nome della casa
     members: List[HouseholdMemberOut]   # lista dei membri della casa
 
+# Versione "a campi scelti" per le GET (?fields=...): l'id c'è sempre, il resto solo
+# se richiesto. Le rotte usano response_model_exclude_unset, quindi i campi non
+# richiesti spariscono dal JSON invece di valere null.
+class HouseholdFieldsOut(BaseModel):
+    id: int
+    name: Optional[str] = None
+    members: Optional[List[HouseholdMemberOut]] = None
+    member_count: Optional[int] = None  # numero di membri, contato in SQL
+
 # Schema per la richiesta di invito: per aggiungere un membro usiamo la sua email.
 class HouseholdInvite(BaseModel):
     email: EmailStr       # email dell'utente già registrato da aggiungere alla casa  
     role: str = "member"  # ruolo nella casa; default = "member"
 
 """
-Perché questi quattro schemi?
+Perché questi schemi?
 HouseholdCreate → cosa ci manda il client quando fa POST /households.
 HouseholdOut → come vogliamo restituire una casa (id, name, members).
+HouseholdFieldsOut → la stessa casa con solo i campi chiesti in ?fields=.
 HouseholdMemberOut → come descriviamo ogni membro nella risposta.
 HouseholdInvite → cosa ci manda il client per aggiungere qualcuno a una casa.
 """
\ No newline at end of file
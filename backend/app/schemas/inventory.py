@@ -0,0 +1,48 @@
+from datetime import date, datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+# Cosa è successo al cibo: mangiato, buttato, scaduto.
+EventType = Literal["consumed", "wasted", "expired"]
+
+# Richiesta per registrare un evento su un item dell'inventario.
+# Se quantity manca, si intende tutto quello che resta dell'item.
+class ConsumptionEventCreate(BaseModel):
+    event_type: EventType
+    quantity: Optional[int] = Field(default=None, gt=0)
+
+# Un evento così come lo restituiamo nelle API.
+class ConsumptionEventOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    household_id: int
+    product_id: int
+    inventory_item_id: Optional[int]
+    event_type: EventType
+    quantity: int
+    unit: str
+    occurred_at: datetime
+
+# Un item da usare presto, con il suo punteggio di urgenza.
+class ExpiringItemOut(BaseModel):
+    item_id: int
+    product_id: int
+    product_name: str
+    category: str
+    quantity: int
+    unit: str
+    location: str
+    expires_at: date
+    days_left: int      # negativo = già scaduto
+    score: float        # più alto = da usare prima
+
+# Suggerimento di combinazione: più item della stessa categoria da usare insieme.
+class CategorySuggestionOut(BaseModel):
+    category: str
+    score: float                # somma dei punteggi degli item
+    item_ids: List[int]
+
+# Risposta dell'endpoint "usalo prima".
+class UseItUpOut(BaseModel):
+    items: List[ExpiringItemOut]
+    combinations: List[CategorySuggestionOut]
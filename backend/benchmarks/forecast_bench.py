@@ -0,0 +1,61 @@
+"""
+Benchmark del calcolo vettoriale delle previsioni (app/core/forecasting.py).
+
+Genera dati sintetici di dimensione crescente e misura le righe/secondo elaborate
+(consumi + item di inventario). Non serve un database: misura solo il calcolo in
+memoria, non la lettura colonnare né l'upsert del job (app/jobs/consumption_forecast.py).
+
+Uso (dalla cartella backend):  python -m benchmarks.forecast_bench
+"""
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from app.core.forecasting import WINDOW_DAYS, build_forecasts
+
+SIZES = (10_000, 100_000, 1_000_000, 5_000_000)
+REPEATS = 3
+
+
+def synthetic(n_rows: int, seed: int = 0):
+    """n_rows righe di consumo + n_rows/4 item, su al massimo ~n_rows/5 coppie (casa, prodotto)."""
+    rng = np.random.default_rng(seed)
+    n_households = max(n_rows // 250, 1)
+    n_products = 50
+    n_items = n_rows // 4
+
+    cons = (
+        rng.integers(1, n_households + 1, n_rows),
+        rng.integers(1, n_products + 1, n_rows),
+        rng.integers(0, WINDOW_DAYS, n_rows),
+        rng.integers(1, 5, n_rows).astype(float),
+    )
+    days_left = rng.integers(-3, 60, n_items).astype(float)
+    days_left[rng.random(n_items) < 0.2] = np.inf  # item senza scadenza
+    inv = (
+        rng.integers(1, n_households + 1, n_items),
+        rng.integers(1, n_products + 1, n_items),
+        rng.integers(1, 10, n_items).astype(float),
+        days_left,
+    )
+    return cons + inv
+
+
+def main() -> None:
+    print(f"{'righe':>12} {'coppie':>10} {'secondi':>10} {'righe/s':>14}")
+    for size in SIZES:
+        args = synthetic(size)
+        rows = size + len(args[4])
+        best = float("inf")
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            result = build_forecasts(*args)
+            best = min(best, time.perf_counter() - start)
+        pairs = len(result["household_id"])
+        print(f"{rows:>12,} {pairs:>10,} {best:>10.3f} {rows / best:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
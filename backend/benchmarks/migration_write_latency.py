@@ -0,0 +1,111 @@
+"""
+Latenza delle scritture durante una migrazione (Postgres locale).
+
+Crea una tabella di prova con N righe, poi per ogni modalità:
+- un thread inserisce righe una alla volta e misura quanto ci mette ogni INSERT
+- intanto il thread principale crea un indice
+    blocking: op.create_index normale (lock SHARE: gli INSERT aspettano)
+    online:   create_index_concurrently di migrations/online.py
+Stampa numero di scritture, p50, p99 e massimo della latenza.
+
+Uso (dalla cartella backend, su un database di prova!):
+    DATABASE_URL=postgresql+psycopg://... python -m benchmarks.migration_write_latency [righe]
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from typing import List
+
+import numpy as np
+from alembic import op
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, text
+
+from migrations import online
+
+TABLE = "migration_latency_probe"
+INDEX = "ix_migration_latency_probe_household_id_quantity"
+DEFAULT_ROWS = 2_000_000
+
+
+def _writer(engine, stop: threading.Event, latencies: List[float]) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        insert = text(f"INSERT INTO {TABLE} (household_id, quantity) VALUES (:hh, :q)")
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            conn.execute(insert, {"hh": i % 10_000, "q": i % 7})
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+
+def _migrate(engine, mode: str) -> float:
+    with engine.connect() as conn:
+        ctx = MigrationContext.configure(conn)
+        with Operations.context(ctx), ctx.begin_transaction():
+            start = time.perf_counter()
+            if mode == "blocking":
+                op.create_index(INDEX, TABLE, ["household_id", "quantity"])
+            else:
+                online.create_index_concurrently(INDEX, TABLE, ["household_id", "quantity"])
+            elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def run_mode(engine, mode: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP INDEX IF EXISTS {INDEX}"))
+
+    latencies: List[float] = []
+    stop = threading.Event()
+    writer = threading.Thread(target=_writer, args=(engine, stop, latencies))
+    writer.start()
+    time.sleep(0.5)  # scritture "a regime" prima della migrazione
+    skip = len(latencies)
+
+    elapsed = _migrate(engine, mode)
+    time.sleep(0.2)
+    stop.set()
+    writer.join()
+
+    ms = np.array(latencies[skip:]) * 1000
+    print(
+        f"{mode:>9}  migrazione {elapsed:6.2f}s  scritture {len(ms):>7,}  "
+        f"p50 {np.percentile(ms, 50):7.2f}ms  p99 {np.percentile(ms, 99):8.2f}ms  "
+        f"max {ms.max():8.2f}ms"
+    )
+
+
+def main() -> None:
+    url = os.getenv("TEST_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not url:
+        raise RuntimeError("Imposta TEST_DATABASE_URL o DATABASE_URL (database di prova)")
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    engine = create_engine(url)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        conn.execute(text(
+            f"CREATE TABLE {TABLE} (id bigserial PRIMARY KEY, household_id int, quantity int)"
+        ))
+        conn.execute(text(
+            f"INSERT INTO {TABLE} (household_id, quantity) "
+            f"SELECT g % 10000, g % 7 FROM generate_series(1, :rows) g"
+        ), {"rows": rows})
+    print(f"Tabella di prova: {rows:,} righe")
+
+    try:
+        for mode in ("blocking", "online"):
+            run_mode(engine, mode)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,18 +14,19 @@ sys.path.append(str(BASE_DIR))
 
 # Carica .env (prima percorso esplicito, poi fallback)
 ENV_PATH = BASE_DIR / ".env"
-load_dotenv(dotenv_path=ENV_PATH, override=True) or load_dotenv(find_dotenv(), override=True)
+load_dotenv(dotenv_path=ENV_PATH, override=False) or load_dotenv(find_dotenv(), override=False)
 
 # Config Alembic e logging
 config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-# Imposta URL DB dalla .env
+# Imposta URL DB dalla .env (non serve se ci passano già una connessione)
 db_url = os.getenv("DATABASE_URL")
-if not db_url:
-    raise RuntimeError(f"DATABASE_URL non trovata (cercato in {ENV_PATH}).")
-config.set_main_option("sqlalchemy.url", db_url)
+if "connection" not in config.attributes:
+    if not db_url:
+        raise RuntimeError(f"DATABASE_URL non trovata (cercato in {ENV_PATH}).")
+    config.set_main_option("sqlalchemy.url", db_url)
 
 # Metadata dei modelli
 from app.db import Base
@@ -41,16 +42,38 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+# Le migrazioni non aspettano in coda dietro transazioni lunghe (bloccando a loro volta
+# tutte le scritture): dopo questo tempo falliscono e si rilanciano. Non vale per le
+# costruzioni CONCURRENTLY, che non bloccano nessuno (vedi migrations/online.py)
+LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+
+
+def do_run_migrations(connection) -> None:
+    # una transazione per revisione: gli autocommit_block (CONCURRENTLY) restano isolati
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
+    # Connessione passata da fuori (es. tests/conftest.py): usiamo quella
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section) or {},
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
+        connect_args={"options": f"-c lock_timeout={LOCK_TIMEOUT}"},
     )
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-        with context.begin_transaction():
-            context.run_migrations()
+        do_run_migrations(connection)
 
 
 if context.is_offline_mode():
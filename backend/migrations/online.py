@@ -0,0 +1,186 @@
+"""
+Helper per migrazioni "online" su tabelle grandi (Postgres).
+
+Le operazioni standard di Alembic prendono lock che bloccano le scritture finché non
+finiscono: su inventory_items con decine di milioni di righe vuol dire API ferme
+durante il deploy. Convenzioni:
+
+- indici:      create_index_concurrently / drop_index_concurrently (fuori transazione);
+               su tabelle partizionate create_partitioned_index_concurrently
+- vincoli:     add_foreign_key_not_valid / add_check_not_valid + validate_constraint
+               (NOT VALID prende il lock per un istante, VALIDATE non blocca le scritture)
+- backfill:    backfill_in_batches, a lotti piccoli con pausa tra un lotto e l'altro
+- colonne:     op.add_column solo nullable o con server_default costante (Postgres 11+
+               non riscrive la tabella); il NOT NULL si aggiunge dopo il backfill con
+               add_check_not_valid("... IS NOT NULL") + validate_constraint
+
+Tabelle create nella stessa revisione sono vuote: lì vanno bene le operazioni normali.
+Il lock_timeout impostato da migrations/env.py è sospeso durante gli indici CONCURRENTLY:
+aspettano le transazioni in corso senza bloccare nessuno, e un timeout a metà
+lascerebbe un indice INVALID.
+migrations/scripts/check_migrations.py segnala le operazioni bloccanti nelle revisioni.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+from alembic import op
+from sqlalchemy import text
+
+
+def _index_is_invalid(name: str) -> bool:
+    """Un CREATE INDEX CONCURRENTLY fallito lascia un indice INVALID da rifare."""
+    row = op.get_bind().execute(
+        text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ),
+        {"name": name},
+    ).first()
+    return bool(row and row[0])
+
+
+@contextmanager
+def _concurrent_block() -> Iterator[None]:
+    """Fuori transazione e senza lock_timeout, per CREATE/DROP INDEX CONCURRENTLY."""
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        previous = bind.execute(text("SHOW lock_timeout")).scalar()
+        bind.execute(text("SET lock_timeout = 0"))
+        try:
+            yield
+        finally:
+            bind.execute(text("SELECT set_config('lock_timeout', :value, false)"), {"value": previous})
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    **kw,
+) -> None:
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS, fuori dalla transazione della migrazione.
+    Le scritture sulla tabella continuano mentre l'indice viene costruito.
+    Rilanciabile: se un tentativo precedente ha lasciato un indice INVALID, lo rifà.
+    """
+    with _concurrent_block():
+        if _index_is_invalid(name):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            name, table, list(columns), unique=unique,
+            postgresql_concurrently=True, if_not_exists=True, **kw,
+        )
+
+
+def create_partitioned_index_concurrently(name: str, table: str, columns: Sequence[str]) -> None:
+    """
+    Indice su una tabella partizionata, dove CREATE INDEX CONCURRENTLY non è ammesso:
+    - CREATE INDEX ... ON ONLY sulla tabella padre (istantaneo, nasce INVALID)
+    - CREATE INDEX CONCURRENTLY su ogni partizione (DEFAULT compresa)
+    - ALTER INDEX ... ATTACH PARTITION: attaccate tutte, l'indice padre diventa valido
+    Le partizioni create dopo ricevono l'indice in automatico.
+    """
+    cols = ", ".join(columns)
+    op.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON ONLY "{table}" ({cols})')
+    partitions = op.get_bind().execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent ORDER BY c.relname"
+        ),
+        {"parent": table},
+    ).scalars().all()
+    for partition in partitions:
+        # nome dell'indice della partizione: troncato come fa Postgres (63 caratteri)
+        child = f"{partition}_{'_'.join(columns)}_idx"[:63]
+        create_index_concurrently(child, partition, columns)
+        with op.get_context().autocommit_block():
+            attached = op.get_bind().execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent "
+                    "WHERE c.relname = :child AND p.relname = :parent)"
+                ),
+                {"child": child, "parent": name},
+            ).scalar()
+            if not attached:
+                op.execute(f'ALTER INDEX "{name}" ATTACH PARTITION "{child}"')
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    """DROP INDEX CONCURRENTLY IF EXISTS, fuori transazione."""
+    with _concurrent_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def add_foreign_key_not_valid(
+    name: str,
+    source_table: str,
+    referent_table: str,
+    local_cols: Sequence[str],
+    remote_cols: Sequence[str],
+    ondelete: str | None = None,
+) -> None:
+    """
+    Aggiunge la FK senza controllare le righe esistenti (NOT VALID): lock brevissimo.
+    Le nuove scritture vengono già controllate; poi chiamare validate_constraint.
+    """
+    op.execute(
+        f'ALTER TABLE "{source_table}" ADD CONSTRAINT "{name}" '
+        f'FOREIGN KEY ({", ".join(local_cols)}) '
+        f'REFERENCES "{referent_table}" ({", ".join(remote_cols)})'
+        + (f" ON DELETE {ondelete}" if ondelete else "")
+        + " NOT VALID"
+    )
+
+
+def add_check_not_valid(name: str, table: str, condition: str) -> None:
+    """Come add_foreign_key_not_valid, per un vincolo CHECK."""
+    op.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" CHECK ({condition}) NOT VALID')
+
+
+def validate_constraint(name: str, table: str) -> None:
+    """
+    VALIDATE CONSTRAINT in una transazione a sé: scansiona la tabella con un lock
+    SHARE UPDATE EXCLUSIVE, che non blocca letture e scritture.
+    """
+    with op.get_context().autocommit_block():
+        op.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{name}"')
+
+
+def backfill_in_batches(
+    table: str,
+    set_clause: str,
+    where: str,
+    batch_size: int = 5_000,
+    pause_seconds: float = 0.05,
+    key: str = "id",
+) -> int:
+    """
+    UPDATE a lotti: ogni lotto è una transazione breve che blocca al massimo
+    'batch_size' righe (SKIP LOCKED: salta quelle in uso dall'app).
+    'where' deve diventare falso per le righe già aggiornate, altrimenti il ciclo non finisce.
+    Ritorna il numero di righe aggiornate.
+    """
+    stmt = text(
+        f'UPDATE "{table}" SET {set_clause} WHERE {key} IN ('
+        f'SELECT {key} FROM "{table}" WHERE {where} '
+        f"LIMIT :batch_size FOR UPDATE SKIP LOCKED)"
+    )
+    remaining = text(f'SELECT EXISTS (SELECT 1 FROM "{table}" WHERE {where})')
+    total = 0
+    with op.get_context().autocommit_block():
+        while True:
+            updated = op.get_bind().execute(stmt, {"batch_size": batch_size}).rowcount
+            total += updated
+            # 0 righe può voler dire "tutte bloccate da altre transazioni": ricontrolliamo
+            if updated == 0 and not op.get_bind().execute(remaining).scalar():
+                break
+            time.sleep(pause_seconds)
+    return total
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import ast
+import re
+import sys
+from pathlib import Path
+from typing import List
+
+VERSIONS_DIR = Path(__file__).resolve().parents[1] / "versions"
+
+# Commento per dire "lo so, qui va bene" (es. tabella piccola) sulla riga dell'operazione
+SUPPRESS = "# online-ok"
+
+# Operazioni che su una tabella esistente prendono lock che bloccano le scritture
+BLOCKING_OPS = {
+    "create_foreign_key": "usa add_foreign_key_not_valid + validate_constraint",
+    "create_check_constraint": "usa add_check_not_valid + validate_constraint",
+    "create_unique_constraint": (
+        "crea l'indice con create_index_concurrently(unique=True) "
+        "e poi ADD CONSTRAINT ... USING INDEX"
+    ),
+    "create_primary_key": "crea l'indice unico CONCURRENTLY e poi ADD PRIMARY KEY USING INDEX",
+}
+
+RAW_SQL_CHECKS = [
+    (re.compile(r"CREATE\s+(UNIQUE\s+)?INDEX\s+(?!CONCURRENTLY)", re.I),
+     "CREATE INDEX senza CONCURRENTLY"),
+    (re.compile(r"DROP\s+INDEX\s+(?!CONCURRENTLY)", re.I),
+     "DROP INDEX senza CONCURRENTLY"),
+    (re.compile(r"ADD\s+CONSTRAINT(?![^;]*\bNOT\s+VALID\b)(?![^;]*\bUSING\s+INDEX\b)", re.I),
+     "ADD CONSTRAINT senza NOT VALID"),
+    (re.compile(r"SET\s+NOT\s+NULL", re.I),
+     "SET NOT NULL scansiona la tabella sotto lock: usa un CHECK NOT VALID"),
+]
+
+
+def _kw(call: ast.Call, name: str):
+    for kw in call.keywords:
+        if kw.arg == name:
+            return kw.value
+    return None
+
+
+def _const(node) -> object:
+    return node.value if isinstance(node, ast.Constant) else None
+
+
+def _sql_text(node) -> str | None:
+    """
+    Testo SQL di op.execute: costanti, f-string e concatenazioni con '+'.
+    Nelle f-string le parti calcolate diventano '{}' (mai una parola chiave come
+    CONCURRENTLY, così il controllo resta prudente). None se il testo non è ricostruibile.
+    """
+    if isinstance(node, ast.Constant):
+        return node.value if isinstance(node.value, str) else None
+    if isinstance(node, ast.JoinedStr):
+        return "".join(
+            part.value if isinstance(part, ast.Constant) else "{}"
+            for part in node.values
+        )
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _sql_text(node.left), _sql_text(node.right)
+        return left + right if left is not None and right is not None else None
+    if isinstance(node, ast.Call) and node.args:
+        # sa.text("...") / text("...")
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+        if name == "text":
+            return _sql_text(node.args[0])
+    return None
+
+
+def _table_arg(call: ast.Call, position: int, keyword: str) -> str | None:
+    node = _kw(call, keyword)
+    if node is None and len(call.args) > position:
+        node = call.args[position]
+    return _const(node) if node is not None else None
+
+
+def check_source(source: str, filename: str = "<revision>") -> List[str]:
+    """Ritorna i problemi trovati, nel formato 'file:riga: messaggio'."""
+    tree = ast.parse(source)
+    lines = source.splitlines()
+
+    op_calls = [
+        node for node in ast.walk(tree)
+        if isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "op"
+    ]
+
+    # tabelle create in questa revisione: sono vuote, lì tutto è permesso
+    new_tables = {
+        _const(call.args[0]) for call in op_calls
+        if call.func.attr == "create_table" and call.args
+    }
+
+    problems: List[str] = []
+
+    def report(call: ast.Call, message: str) -> None:
+        if SUPPRESS not in lines[call.lineno - 1]:
+            problems.append(f"{filename}:{call.lineno}: {message}")
+
+    for call in op_calls:
+        name = call.func.attr
+        concurrently = _const(_kw(call, "postgresql_concurrently")) is True
+
+        if name == "create_index":
+            table = _table_arg(call, 1, "table_name")
+            if table not in new_tables and not concurrently:
+                report(call, f"create_index su '{table}' blocca le scritture: usa create_index_concurrently")
+
+        elif name == "drop_index":
+            table = _table_arg(call, 1, "table_name")
+            if table not in new_tables and not concurrently:
+                report(call, f"drop_index su '{table}' blocca le scritture: usa drop_index_concurrently")
+
+        elif name in BLOCKING_OPS:
+            table = _table_arg(call, 1, "table_name")
+            if table not in new_tables:
+                report(call, f"{name} su '{table}': {BLOCKING_OPS[name]}")
+
+        elif name == "add_column":
+            table = _table_arg(call, 0, "table_name")
+            column = call.args[1] if len(call.args) > 1 else None
+            if table not in new_tables and isinstance(column, ast.Call):
+                nullable = _const(_kw(column, "nullable"))
+                if nullable is False and _kw(column, "server_default") is None:
+                    report(call, f"add_column NOT NULL senza server_default su '{table}'")
+
+        elif name == "alter_column":
+            table = _table_arg(call, 0, "table_name")
+            if table in new_tables:
+                continue
+            if _kw(call, "type_") is not None:
+                report(call, f"alter_column type_ su '{table}' riscrive la tabella sotto lock")
+            if _const(_kw(call, "nullable")) is False:
+                report(call, f"alter_column nullable=False su '{table}': usa un CHECK NOT VALID")
+
+        elif name == "execute" and call.args:
+            sql = _sql_text(call.args[0])
+            if sql is None:
+                report(call, "op.execute con SQL non costante: non si può controllare")
+                continue
+            for pattern, message in RAW_SQL_CHECKS:
+                if pattern.search(sql):
+                    report(call, message)
+
+    return problems
+
+
+def main() -> None:
+    """
+    Controlla le revisioni in migrations/versions (o i file passati come argomenti)
+    e segnala le operazioni che bloccano le scritture su tabelle esistenti.
+    Uso: python migrations/scripts/check_migrations.py [file ...]
+    Exit code 1 se trova problemi (da usare in CI).
+    """
+    paths = [Path(p) for p in sys.argv[1:]] or sorted(VERSIONS_DIR.glob("*.py"))
+    problems: List[str] = []
+    for path in paths:
+        problems += check_source(path.read_text(encoding="utf-8"), str(path))
+
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f"{len(problems)} operazioni bloccanti (vedi migrations/online.py).")
+        sys.exit(1)
+    print(f"Migrazioni ok ({len(paths)} file).")
+
+
+if __name__ == "__main__":
+    main()
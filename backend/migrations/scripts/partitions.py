@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import argparse
+from datetime import date
+
+from app.db import get_engine
+from app.core.partitions import (
+    add_months, ensure_month_partitions, detach_partitions_before, month_start
+)
+
+def main() -> None:
+    """
+    Manutenzione delle partizioni di consumption_events (da lanciare con cron, es. ogni giorno):
+    - crea le partizioni dei prossimi mesi (spostando le righe finite nella DEFAULT)
+    - opzionale: stacca/archivia quelle più vecchie di N mesi
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--keep-months", type=int, default=None,
+                        help="stacca le partizioni più vecchie di N mesi")
+    parser.add_argument("--archive-schema", default=None,
+                        help="schema dove spostare le partizioni staccate (es. archive)")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        created = ensure_month_partitions(conn, months_ahead=args.months_ahead)
+        print("Partizioni pronte:", ", ".join(created))
+
+    if args.keep_months is not None:
+        # DETACH ... CONCURRENTLY non può stare in una transazione
+        cutoff = add_months(month_start(date.today()), -args.keep_months)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            detached = detach_partitions_before(conn, cutoff, archive_schema=args.archive_schema)
+        print("Partizioni staccate:", ", ".join(detached) or "nessuna")
+
+if __name__ == "__main__":
+    main()
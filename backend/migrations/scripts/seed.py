@@ -3,7 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
-from app.db import Base, engine, SessionLocal
+from app.db import Base, get_engine, SessionLocal
 import app.models as m
 
 # Carica .env
@@ -11,7 +11,7 @@ load_dotenv(Path(__file__).resolve().parents[1] / ".env")
 
 def main() -> None:
     # ATTENZIONE: in produzione usa solo Alembic; create_all è ok per dev/seed
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
 
     with SessionLocal() as db: 
         u = m.User(email="demo@fridly.test", hashed_password="HASH_FINTA")
@@ -0,0 +1,53 @@
+"""consumption events (partitioned by month)
+
+Revision ID: 3b7e1c2a9d41
+Revises: 9f07687c5d4c
+Create Date: 2026-10-19 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.partitions import ensure_month_partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1c2a9d41'
+down_revision: Union[str, Sequence[str], None] = '9f07687c5d4c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # tabella padre partizionata per mese su occurred_at
+    op.create_table('consumption_events',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('occurred_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('household_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('inventory_item_id', sa.Integer(), nullable=True),
+    sa.Column('event_type', sa.String(length=16), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit', sa.String(length=8), nullable=False),
+    sa.CheckConstraint("event_type IN ('consumed', 'wasted', 'expired')", name=op.f('ck_consumption_events_event_type')),
+    sa.ForeignKeyConstraint(['household_id'], ['households.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='RESTRICT'),
+    sa.PrimaryKeyConstraint('id', 'occurred_at'),
+    postgresql_partition_by='RANGE (occurred_at)'
+    )
+    op.create_index('ix_consumption_events_household_id_occurred_at', 'consumption_events', ['household_id', 'occurred_at'], unique=False)
+    op.create_index(op.f('ix_consumption_events_product_id'), 'consumption_events', ['product_id'], unique=False)
+
+    # partizioni del mese corrente + 3 mesi avanti (poi ci pensa migrations/scripts/partitions.py)
+    ensure_month_partitions(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # DROP della tabella padre elimina anche le partizioni attaccate
+    op.drop_index(op.f('ix_consumption_events_product_id'), table_name='consumption_events')
+    op.drop_index('ix_consumption_events_household_id_occurred_at', table_name='consumption_events')
+    op.drop_table('consumption_events')
@@ -0,0 +1,62 @@
+"""waste rollups
+
+Revision ID: a41d6e0c8b27
+Revises: 3b7e1c2a9d41
+Create Date: 2026-10-19 11:02:47.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41d6e0c8b27'
+down_revision: Union[str, Sequence[str], None] = '3b7e1c2a9d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _rollup_columns() -> list:
+    return [
+        sa.Column('household_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(length=16), nullable=False),
+        sa.Column('unit', sa.String(length=8), nullable=False),
+        sa.Column('category', sa.String(length=120), nullable=False),
+        sa.Column('quantity', sa.BigInteger(), nullable=False),
+        sa.Column('events', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['household_id'], ['households.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('waste_rollups_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    *_rollup_columns(),
+    sa.PrimaryKeyConstraint('day', 'household_id', 'product_id', 'event_type', 'unit')
+    )
+    op.create_index('ix_waste_rollups_daily_household_id_day', 'waste_rollups_daily', ['household_id', 'day'], unique=False)
+    op.create_table('waste_rollups_monthly',
+    sa.Column('month', sa.Date(), nullable=False),
+    *_rollup_columns(),
+    sa.PrimaryKeyConstraint('month', 'household_id', 'product_id', 'event_type', 'unit')
+    )
+    op.create_index('ix_waste_rollups_monthly_household_id_month', 'waste_rollups_monthly', ['household_id', 'month'], unique=False)
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('processed_until', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rollup_watermarks')
+    op.drop_index('ix_waste_rollups_monthly_household_id_month', table_name='waste_rollups_monthly')
+    op.drop_table('waste_rollups_monthly')
+    op.drop_index('ix_waste_rollups_daily_household_id_day', table_name='waste_rollups_daily')
+    op.drop_table('waste_rollups_daily')
@@ -0,0 +1,36 @@
+"""idempotency keys request hash and expiry index
+
+Revision ID: a7d2e4f91c38
+Revises: f3a8c0e5d217
+Create Date: 2026-10-20 11:02:36.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import online
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2e4f91c38'
+down_revision: Union[str, Sequence[str], None] = 'f3a8c0e5d217'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nullable: le chiavi già salvate non hanno hash (si controlla solo lo scope)
+    op.add_column('idempotency_keys', sa.Column('request_hash', sa.String(length=64), nullable=True))
+    # per il job di pulizia delle chiavi scadute
+    online.create_index_concurrently(
+        op.f('ix_idempotency_keys_created_at'), 'idempotency_keys', ['created_at']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    online.drop_index_concurrently(op.f('ix_idempotency_keys_created_at'), 'idempotency_keys')
+    op.drop_column('idempotency_keys', 'request_hash')
@@ -0,0 +1,43 @@
+"""consumption events xact id for rollups
+
+Revision ID: b2c7e5a19f04
+Revises: a7d2e4f91c38
+Create Date: 2026-10-20 14:18:05.327761
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import online
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2c7e5a19f04'
+down_revision: Union[str, Sequence[str], None] = 'a7d2e4f91c38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # transazione che ha inserito l'evento: il watermark dei rollup avanza su questa,
+    # non su occurred_at. Colonna nullable e default impostato dopo: niente riscrittura
+    # (le righe già presenti restano NULL, il job le gestisce al primo giro)
+    op.add_column('consumption_events', sa.Column('xact_id', sa.BigInteger(), nullable=True))
+    op.alter_column(
+        'consumption_events', 'xact_id',
+        server_default=sa.text('(pg_current_xact_id())::text::bigint'),
+    )
+    online.create_partitioned_index_concurrently(
+        'ix_consumption_events_xact_id', 'consumption_events', ['xact_id']
+    )
+    op.add_column('rollup_watermarks', sa.Column('processed_xact_id', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('rollup_watermarks', 'processed_xact_id')
+    # DROP COLUMN si porta via anche l'indice (e quelli delle partizioni)
+    op.drop_column('consumption_events', 'xact_id')
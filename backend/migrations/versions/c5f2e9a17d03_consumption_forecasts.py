@@ -0,0 +1,42 @@
+"""consumption forecasts
+
+Revision ID: c5f2e9a17d03
+Revises: a41d6e0c8b27
+Create Date: 2026-10-19 12:24:10.551862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f2e9a17d03'
+down_revision: Union[str, Sequence[str], None] = 'a41d6e0c8b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('consumption_forecasts',
+    sa.Column('household_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('unit', sa.String(length=8), nullable=False),
+    sa.Column('daily_rate', sa.Float(), nullable=False),
+    sa.Column('stock_quantity', sa.Integer(), nullable=False),
+    sa.Column('runs_out_on', sa.Date(), nullable=True),
+    sa.Column('next_expiry_on', sa.Date(), nullable=True),
+    sa.Column('expected_waste', sa.Float(), nullable=False),
+    sa.Column('will_expire_before_used', sa.Boolean(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['household_id'], ['households.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('household_id', 'product_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('consumption_forecasts')
@@ -0,0 +1,31 @@
+"""consumption events default partition
+
+Revision ID: e6c1d94b2f70
+Revises: d8a3b6f41e92
+Create Date: 2026-10-20 09:41:17.553209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.partitions import default_partition_name, ensure_default_partition
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c1d94b2f70'
+down_revision: Union[str, Sequence[str], None] = 'd8a3b6f41e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # se il cron delle partizioni si ferma gli insert finiscono qui invece di fallire
+    ensure_default_partition(op.get_bind(), 'consumption_events')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table(default_partition_name('consumption_events'))
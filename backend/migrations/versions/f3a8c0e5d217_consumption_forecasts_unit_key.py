@@ -0,0 +1,49 @@
+"""consumption forecasts keyed by unit
+
+Revision ID: f3a8c0e5d217
+Revises: e6c1d94b2f70
+Create Date: 2026-10-20 10:27:52.118094
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations import online
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8c0e5d217'
+down_revision: Union[str, Sequence[str], None] = 'e6c1d94b2f70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TMP_INDEX = 'ix_consumption_forecasts_pk_tmp'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # PK (household_id, product_id) -> (household_id, product_id, unit):
+    # indice unico costruito CONCURRENTLY e poi scambiato con la PK (lock brevissimo)
+    online.create_index_concurrently(
+        TMP_INDEX, 'consumption_forecasts', ['household_id', 'product_id', 'unit'], unique=True
+    )
+    op.execute(
+        'ALTER TABLE consumption_forecasts DROP CONSTRAINT pk_consumption_forecasts, '
+        f'ADD CONSTRAINT pk_consumption_forecasts PRIMARY KEY USING INDEX {TMP_INDEX}'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # con più unità per coppia la vecchia PK non si può ricreare: la tabella è
+    # derivata, la svuotiamo e la ricalcola il job
+    op.execute('DELETE FROM consumption_forecasts')
+    online.create_index_concurrently(
+        TMP_INDEX, 'consumption_forecasts', ['household_id', 'product_id'], unique=True
+    )
+    op.execute(
+        'ALTER TABLE consumption_forecasts DROP CONSTRAINT pk_consumption_forecasts, '
+        f'ADD CONSTRAINT pk_consumption_forecasts PRIMARY KEY USING INDEX {TMP_INDEX}'
+    )
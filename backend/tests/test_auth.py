@@ -0,0 +1,53 @@
+from app.core.security import create_access_token
+
+
+def test_register_returns_safe_user(client):
+    r = client.post("/api/auth/register", json={"email": "anna@example.com", "password": "pw"})
+    assert r.status_code == 201
+    body = r.json()
+    assert body["email"] == "anna@example.com"
+    assert "password" not in body and "hashed_password" not in body
+
+
+def test_register_duplicate_email(client):
+    payload = {"email": "anna@example.com", "password": "pw"}
+    assert client.post("/api/auth/register", json=payload).status_code == 201
+    r = client.post("/api/auth/register", json=payload)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Email già registrata"
+
+
+def test_login_and_me(client, register):
+    email, headers = register()
+    r = client.get("/api/auth/me", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["email"] == email
+
+
+def test_login_wrong_password(client, register):
+    email, _ = register(password="giusta")
+    r = client.post("/api/auth/login", data={"username": email, "password": "sbagliata"})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Credenziali non valide"
+
+
+def test_login_unknown_email(client):
+    r = client.post("/api/auth/login", data={"username": "nessuno@example.com", "password": "x"})
+    assert r.status_code == 400
+
+
+def test_me_requires_token(client):
+    assert client.get("/api/auth/me").status_code == 401
+
+
+def test_me_invalid_token(client):
+    r = client.get("/api/auth/me", headers={"Authorization": "Bearer non-un-jwt"})
+    assert r.status_code == 401
+    assert r.json()["detail"] == "Token invalido"
+
+
+def test_me_unknown_user(client):
+    token = create_access_token(subject=999_999)
+    r = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 401
+    assert r.json()["detail"] == "Utente non trovato"
@@ -0,0 +1,93 @@
+from sqlalchemy import event
+
+from app.api import auth
+
+
+def _create(client, headers, name="Casa"):
+    r = client.post("/api/households/", json={"name": name}, headers=headers)
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+def test_batch_startup_calls(client, register):
+    email, headers = register()
+    hh = _create(client, headers)
+
+    r = client.post("/api/batch", headers=headers, json={"requests": [
+        {"id": "me", "path": "/api/auth/me"},
+        {"id": "list", "path": "/api/households/"},
+        {"id": "one", "path": f"/api/households/{hh['id']}"},
+        {"id": "missing", "path": "/api/households/999999"},
+    ]})
+    assert r.status_code == 200, r.text
+    by_id = {x["id"]: x for x in r.json()["responses"]}
+    assert by_id["me"]["status"] == 200 and by_id["me"]["body"]["email"] == email
+    assert [h["id"] for h in by_id["list"]["body"]] == [hh["id"]]
+    assert by_id["one"]["body"] == hh
+    assert by_id["missing"]["status"] == 404
+
+
+def test_batch_resolves_user_once(client, register, monkeypatch, db):
+    _, headers = register()
+    calls = []
+    decode = auth.jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *a, **kw: calls.append(1) or decode(*a, **kw))
+    user_selects = []
+
+    @event.listens_for(db.connection(), "before_cursor_execute")
+    def _count_user_selects(conn, cursor, statement, *args):
+        if statement.lstrip().startswith("SELECT") and "FROM users" in statement:
+            user_selects.append(statement)
+
+    r = client.post("/api/batch", headers=headers, json={"requests": [
+        {"path": "/api/auth/me"}, {"path": "/api/households/"}, {"path": "/api/auth/me"},
+    ]})
+    assert [x["status"] for x in r.json()["responses"]] == [200, 200, 200]
+    assert len(calls) == 1
+    assert len(user_selects) == 1
+
+
+def test_batch_write_and_validation_error(client, register):
+    _, headers = register()
+    r = client.post("/api/batch", headers=headers, json={"requests": [
+        {"method": "POST", "path": "/api/households/", "body": {"name": "Casa Batch"}},
+        {"method": "POST", "path": "/api/households/", "body": {}},
+    ]})
+    created, invalid = r.json()["responses"]
+    assert created["status"] == 201 and created["body"]["name"] == "Casa Batch"
+    assert invalid["status"] == 422
+
+    names = [h["name"] for h in client.get("/api/households/", headers=headers).json()]
+    assert names == ["Casa Batch"]
+
+
+def test_batch_requires_auth_and_rejects_nesting(client, register):
+    assert client.post("/api/batch", json={"requests": [{"path": "/api/auth/me"}]}).status_code == 401
+    _, headers = register()
+    r = client.post("/api/batch", headers=headers, json={"requests": [{"path": "/api/batch"}]})
+    assert r.status_code == 422
+
+
+def test_batch_write_after_read_sees_fresh_data(client, register, db):
+    # la Session tiene gli oggetti solo finché qualcuno li referenzia: li teniamo
+    # vivi noi, come farebbe una cache o una relazione caricata
+    loaded = []
+    event.listen(db, "loaded_as_persistent", lambda session, obj: loaded.append(obj))
+    guest_email, _ = register()
+    _, headers = register()
+    hh = _create(client, headers)
+    url = f"/api/households/{hh['id']}/members"
+    key = {"Idempotency-Key": "batch-add-guest"}
+
+    r = client.post("/api/batch", headers=headers, json={"requests": [
+        {"id": "read", "path": f"/api/households/{hh['id']}"},
+        {"id": "add", "method": "POST", "path": url, "headers": key, "body": {"email": guest_email}},
+    ]})
+    read, add = r.json()["responses"]
+    assert len(read["body"]["members"]) == 1
+    assert add["status"] == 200, add
+    assert guest_email in [m["email"] for m in add["body"]["members"]]
+
+    # la risposta salvata per la chiave è quella giusta
+    replay = client.post(url, json={"email": guest_email}, headers={**headers, **key})
+    assert replay.json() == add["body"]
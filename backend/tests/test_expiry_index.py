@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+
+from sqlalchemy import delete, event
+
+from app.core.expiry_index import EXPIRED_MAX_DAYS, ExpiryIndex
+from app.models.inventory_item import InventoryItem
+from app.models.product import Product
+
+
+def _household(client, headers):
+    r = client.post("/api/households/", json={"name": "Casa"}, headers=headers)
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _stock(db, household_id, *items):
+    """Crea prodotti e item: items = (nome, categoria, giorni alla scadenza, posizione)."""
+    rows = []
+    for name, category, days, location in items:
+        product = Product(name=name, category=category)
+        item = InventoryItem(
+            household_id=household_id, product=product, location=location,
+            expires_at=date.today() + timedelta(days=days),
+        )
+        db.add(item)
+        rows.append(item)
+    db.commit()
+    return [item.id for item in rows]
+
+
+def _suggestions(client, headers, household_id, **params):
+    r = client.get(f"/api/households/{household_id}/suggestions", params=params, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_suggestions_order_and_combinations(client, register, db):
+    _, headers = register()
+    hh = _household(client, headers)
+    milk, yogurt, pasta, later = _stock(
+        db, hh,
+        ("Latte", "latticini", 1, "fridge"),
+        ("Yogurt", "latticini", 2, "fridge"),
+        ("Pasta", "dispensa", 0, "pantry"),
+        ("Tonno", "dispensa", 30, "pantry"),
+    )
+
+    body = _suggestions(client, headers, hh, horizon_days=7)
+
+    # pasta 0.8/1, latte 1/2, yogurt 1/3; il tonno è fuori orizzonte
+    assert [i["item_id"] for i in body["items"]] == [pasta, milk, yogurt]
+    assert body["combinations"] == [
+        {"category": "latticini", "score": 1 / 2 + 1 / 3, "item_ids": [milk, yogurt]},
+    ]
+
+
+def test_long_expired_items_are_not_suggested(client, register, db):
+    _, headers = register()
+    hh = _household(client, headers)
+    recent, _ = _stock(
+        db, hh,
+        ("Latte", "latticini", -EXPIRED_MAX_DAYS, "fridge"),
+        ("Panna", "latticini", -EXPIRED_MAX_DAYS - 30, "fridge"),
+    )
+
+    body = _suggestions(client, headers, hh)
+    assert [(i["item_id"], i["days_left"]) for i in body["items"]] == [(recent, -EXPIRED_MAX_DAYS)]
+    assert body["combinations"] == []
+
+
+def test_product_edit_reaches_suggestions(client, register, db):
+    _, headers = register()
+    hh = _household(client, headers)
+    _stock(db, hh, ("Latte", "latticini", 1, "fridge"), ("Burro", "latticini", 2, "fridge"))
+    assert _suggestions(client, headers, hh)["combinations"][0]["category"] == "latticini"
+
+    butter = db.query(Product).filter_by(name="Burro").one()
+    butter.name, butter.category = "Burro salato", "condimenti"
+    db.commit()
+
+    body = _suggestions(client, headers, hh)
+    assert [(i["product_name"], i["category"]) for i in body["items"]] == [
+        ("Latte", "latticini"), ("Burro salato", "condimenti"),
+    ]
+    assert body["combinations"] == []
+
+
+def test_load_that_races_with_a_commit_is_redone(client, register, db):
+    _, headers = register()
+    hh = _household(client, headers)
+    gone, kept = _stock(db, hh, ("Latte", "latticini", 1, "fridge"), ("Yogurt", "latticini", 2, "fridge"))
+    index = ExpiryIndex()
+    loads = []
+
+    @event.listens_for(db, "do_orm_execute")
+    def _commit_during_first_load(state):
+        if not state.is_select:
+            return None
+        loads.append(state.statement)
+        if len(loads) > 1:
+            return None
+        # la query legge ancora l'item, poi un altro commit lo cancella
+        snapshot = state.invoke_statement().freeze()
+        db.connection().execute(delete(InventoryItem).where(InventoryItem.id == gone))
+        index.apply_changes([], [(hh, gone)])
+        return snapshot()
+
+    index.ensure_loaded(db, hh)
+
+    assert len(loads) == 2
+    assert [s.item.id for s in index.score(hh, date.today(), 7)] == [kept]
+
+
+def test_households_are_evicted_lru(client, register, db):
+    _, headers = register()
+    households = [_household(client, headers) for _ in range(3)]
+    for hh in households:
+        _stock(db, hh, ("Latte", "latticini", 1, "fridge"))
+    index = ExpiryIndex(max_households=2)
+    loads = []
+    event.listen(db, "do_orm_execute", lambda state: loads.append(state.statement))
+    first, second, third = households
+
+    index.ensure_loaded(db, first)
+    index.ensure_loaded(db, second)
+    index.ensure_loaded(db, first)            # ancora fresca: solo "usata"
+    index.ensure_loaded(db, third)            # esce 'second', la meno usata
+    assert len(loads) == 3
+
+    assert index.score(second, date.today(), 7) == []
+    assert [len(index.score(hh, date.today(), 7)) for hh in (first, third)] == [1, 1]
+    index.ensure_loaded(db, second)
+    assert len(loads) == 4
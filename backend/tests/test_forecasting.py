@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from app.core.forecasting import days_until_empty, ewma_daily_rates, project_stock
+from app.jobs.consumption_forecast import FORECAST_HORIZON_DAYS, _offset_dates, compute_chunk
+
+TODAY = date(2026, 10, 20)
+
+
+def _cols(**cols):
+    return {k: np.array(v, dtype=object) for k, v in cols.items()}
+
+
+def test_units_are_never_summed_together():
+    # stesso prodotto consumato e tenuto sia in grammi sia in pezzi
+    cons = _cols(
+        household_id=[1, 1, 1],
+        product_id=[7, 7, 7],
+        day=[TODAY - timedelta(days=1), TODAY - timedelta(days=1), TODAY - timedelta(days=2)],
+        quantity=[500, 1, 1],
+        unit=["g", "pz", "pz"],
+    )
+    inv = _cols(
+        household_id=[1, 1],
+        product_id=[7, 7],
+        quantity=[1000, 3],
+        expires_at=[None, TODAY + timedelta(days=10)],
+        unit=["g", "pz"],
+    )
+    rows = compute_chunk(cons, inv, TODAY, datetime.now(tz=timezone.utc))
+
+    by_unit = {r["unit"]: r for r in rows}
+    assert sorted(by_unit) == ["g", "pz"]
+    assert by_unit["g"]["stock_quantity"] == 1000
+    assert by_unit["pz"]["stock_quantity"] == 3
+    # il ritmo in grammi non "gonfia" quello in pezzi
+    assert by_unit["g"]["daily_rate"] > 100 * by_unit["pz"]["daily_rate"]
+    assert all((r["household_id"], r["product_id"]) == (1, 7) for r in rows)
+
+
+def test_ewma_rate_by_hand():
+    # emivita 1 giorno, finestra 2 giorni: pesi 1 e 0.5, denominatore 1.5
+    rates = ewma_daily_rates(
+        pair=np.array([0, 1, 1]),
+        age_days=np.array([0, 1, 2]),          # il consumo di 2 giorni fa è fuori finestra
+        quantity=np.array([3.0, 3.0, 100.0]),
+        n_pairs=2,
+        half_life_days=1.0,
+        window_days=2,
+    )
+    assert rates.tolist() == [2.0, 1.0]
+
+
+def test_project_stock_uses_first_what_expires_first():
+    # coppia 0 al ritmo di 1/giorno: 2 pz scadono fra 1 giorno, 4 fra 2, 3 mai
+    # cumulati per scadenza 2, 6, 9 contro 1, 2, inf consumabili -> mancano 1, 4, 0
+    # coppia 1 non si consuma: il suo unico item va tutto sprecato
+    pairs, stock, next_expiry, waste = project_stock(
+        pair=np.array([0, 0, 0, 1]),
+        quantity=np.array([2, 3, 4, 1]),
+        days_left=np.array([1.0, np.inf, 2.0, 5.0]),
+        rates=np.array([1.0, 0.0]),
+    )
+    assert pairs.tolist() == [0, 1]
+    assert stock.tolist() == [9.0, 1.0]
+    assert next_expiry.tolist() == [1.0, 5.0]
+    assert waste.tolist() == [4.0, 1.0]
+
+
+def test_days_until_empty_by_hand():
+    days = days_until_empty(np.array([10.0, 5.0, 0.0]), np.array([2.0, 0.0, 0.5]))
+    assert days.tolist() == [5.0, np.inf, 0.0]
+
+
+def test_dates_beyond_the_horizon_are_null():
+    days = np.array([0.5, 2.9, FORECAST_HORIZON_DAYS, FORECAST_HORIZON_DAYS + 1, 1e9, np.inf])
+    assert _offset_dates(TODAY, days) == [
+        TODAY, TODAY + timedelta(days=2), TODAY + timedelta(days=FORECAST_HORIZON_DAYS),
+        None, None, None,
+    ]
+
+
+def test_huge_stock_with_tiny_rate_has_no_run_out_date():
+    # un consumo di 89 giorni fa e un miliardo di pezzi: oltre l'anno 9999
+    cons = _cols(
+        household_id=[1], product_id=[7], day=[TODAY - timedelta(days=89)],
+        quantity=[1], unit=["pz"],
+    )
+    inv = _cols(household_id=[1], product_id=[7], quantity=[10**9], expires_at=[None], unit=["pz"])
+    [row] = compute_chunk(cons, inv, TODAY, datetime.now(tz=timezone.utc))
+    assert row["daily_rate"] > 0
+    assert row["runs_out_on"] is None
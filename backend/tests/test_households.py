@@ -0,0 +1,172 @@
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+
+def _create(client, headers, name="Casa", **extra_headers):
+    r = client.post("/api/households/", json={"name": name}, headers={**headers, **extra_headers})
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+def test_create_household_makes_owner(client, register):
+    email, headers = register()
+    hh = _create(client, headers, "Casa Rossi")
+    assert hh["name"] == "Casa Rossi"
+    assert [(m["email"], m["role"]) for m in hh["members"]] == [(email, "owner")]
+
+
+def test_list_only_own_households(client, register):
+    _, alice = register()
+    _, bob = register()
+    mine = _create(client, alice, "Casa Alice")
+    _create(client, bob, "Casa Bob")
+
+    r = client.get("/api/households/", headers=alice)
+    assert r.status_code == 200
+    assert [hh["id"] for hh in r.json()] == [mine["id"]]
+
+
+def test_get_household(client, register):
+    _, headers = register()
+    hh = _create(client, headers)
+    r = client.get(f"/api/households/{hh['id']}", headers=headers)
+    assert r.status_code == 200
+    assert r.json() == hh
+
+
+def test_get_household_not_member(client, register):
+    _, alice = register()
+    _, bob = register()
+    hh = _create(client, alice)
+    r = client.get(f"/api/households/{hh['id']}", headers=bob)
+    assert r.status_code == 404
+
+
+def test_add_member(client, register):
+    _, owner = register()
+    guest_email, guest = register()
+    hh = _create(client, owner)
+
+    r = client.post(f"/api/households/{hh['id']}/members", json={"email": guest_email}, headers=owner)
+    assert r.status_code == 200
+    roles = {m["email"]: m["role"] for m in r.json()["members"]}
+    assert roles[guest_email] == "member"
+
+    # ora anche l'invitato vede la casa
+    assert client.get(f"/api/households/{hh['id']}", headers=guest).status_code == 200
+
+
+def test_add_member_already_member(client, register):
+    _, owner = register()
+    guest_email, _ = register()
+    hh = _create(client, owner)
+    url = f"/api/households/{hh['id']}/members"
+    assert client.post(url, json={"email": guest_email}, headers=owner).status_code == 200
+    r = client.post(url, json={"email": guest_email}, headers=owner)
+    assert r.status_code == 400
+
+
+def test_add_member_unknown_email(client, register):
+    _, owner = register()
+    hh = _create(client, owner)
+    r = client.post(
+        f"/api/households/{hh['id']}/members",
+        json={"email": "nessuno@example.com"},
+        headers=owner,
+    )
+    assert r.status_code == 404
+
+
+def test_add_member_requires_owner(client, register):
+    _, owner = register()
+    guest_email, guest = register()
+    other_email, _ = register()
+    hh = _create(client, owner)
+    url = f"/api/households/{hh['id']}/members"
+    client.post(url, json={"email": guest_email}, headers=owner)
+
+    r = client.post(url, json={"email": other_email}, headers=guest)
+    assert r.status_code == 403
+
+
+def test_add_member_not_member(client, register):
+    _, owner = register()
+    _, stranger = register()
+    other_email, _ = register()
+    hh = _create(client, owner)
+    r = client.post(f"/api/households/{hh['id']}/members", json={"email": other_email}, headers=stranger)
+    assert r.status_code == 404
+
+
+def test_create_household_idempotency_key(client, register):
+    _, headers = register()
+    first = _create(client, headers, "Casa", **{"Idempotency-Key": "retry-1"})
+    second = _create(client, headers, "Casa", **{"Idempotency-Key": "retry-1"})
+    assert second == first
+    assert len(client.get("/api/households/", headers=headers).json()) == 1
+
+
+def test_idempotency_key_other_route(client, register):
+    guest_email, _ = register()
+    _, headers = register()
+    hh = _create(client, headers, **{"Idempotency-Key": "k"})
+    r = client.post(
+        f"/api/households/{hh['id']}/members",
+        json={"email": guest_email},
+        headers={**headers, "Idempotency-Key": "k"},
+    )
+    assert r.status_code == 422
+
+
+def test_idempotency_key_other_body(client, register):
+    _, headers = register()
+    _create(client, headers, "Casa", **{"Idempotency-Key": "k"})
+    r = client.post(
+        "/api/households/", json={"name": "Altra casa"},
+        headers={**headers, "Idempotency-Key": "k"},
+    )
+    assert r.status_code == 422
+    assert len(client.get("/api/households/", headers=headers).json()) == 1
+
+
+def test_expired_idempotency_key_is_reused(client, register, db):
+    _, headers = register()
+    first = _create(client, headers, "Casa", **{"Idempotency-Key": "k"})
+    db.execute(text("UPDATE idempotency_keys SET created_at = now() - interval '2 days'"))
+
+    second = _create(client, headers, "Casa", **{"Idempotency-Key": "k"})
+    assert second["id"] != first["id"]
+    # e la nuova risposta è quella salvata per i retry
+    assert _create(client, headers, "Casa", **{"Idempotency-Key": "k"}) == second
+
+
+def test_list_households_sparse_fields(client, register):
+    _, owner = register()
+    guest_email, _ = register()
+    hh = _create(client, owner, "Casa Picker")
+    client.post(f"/api/households/{hh['id']}/members", json={"email": guest_email}, headers=owner)
+
+    statements = []
+    listen = lambda conn, cursor, statement, *a: statements.append(statement)  # noqa: E731
+    event.listen(Engine, "before_cursor_execute", listen)
+    try:
+        r = client.get("/api/households/?fields=name,member_count", headers=owner)
+    finally:
+        event.remove(Engine, "before_cursor_execute", listen)
+
+    assert r.status_code == 200
+    assert r.json() == [{"id": hh["id"], "name": "Casa Picker", "member_count": 2}]
+    # utente loggato + lista con il conteggio: membri e loro utenti non vengono caricati
+    selects = [s for s in statements if s.startswith("SELECT")]
+    assert len(selects) == 2, selects
+
+
+def test_get_household_fields(client, register):
+    _, headers = register()
+    hh = _create(client, headers)
+    url = f"/api/households/{hh['id']}"
+
+    assert client.get(url, params={"fields": "id"}, headers=headers).json() == {"id": hh["id"]}
+    r = client.get(url, params={"fields": "members,member_count"}, headers=headers)
+    assert r.json() == {"id": hh["id"], "members": hh["members"], "member_count": 1}
+    assert client.get(url, params={"fields": "name,colore"}, headers=headers).status_code == 422
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool, StaticPool
+
+from app.core.metrics import PoolCollector, pool_saturated
+from app.core.readiness import ReadinessCheck
+
+
+def _sample(text, name, **labels):
+    """Valore di una serie nel formato testo di Prometheus (None se manca)."""
+    wanted = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    prefix = f"{name}{{{wanted}}} " if labels else f"{name} "
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+
+@pytest.fixture
+def scrape(client, monkeypatch):
+    """GET /api/metrics con il token di Prometheus."""
+    monkeypatch.setattr("app.api.routes.METRICS_TOKEN", "scrape-secret")
+    return lambda: client.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+
+def test_metrics_per_route_and_pool(client, register, scrape):
+    _, headers = register()
+    before = scrape().text
+    label = dict(method="GET", route="/api/households/{household_id}", status="404")
+    count = _sample(before, "fridly_http_request_duration_seconds_count", **label) or 0
+
+    client.get("/api/households/123456", headers=headers)
+    client.get("/api/households/654321", headers=headers)
+
+    r = scrape()
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    # un'unica serie per il template della rotta, non una per id
+    assert _sample(body, "fridly_http_request_duration_seconds_count", **label) == count + 2
+    assert _sample(body, "fridly_http_requests_in_progress") == 1  # lo scrape stesso
+    assert _sample(body, "fridly_db_pool_checked_out") is not None
+    assert _sample(body, "fridly_password_hashing_in_progress") == 0
+    assert _sample(body, "fridly_password_hashing_seconds_count", operation="verify") >= 1
+    assert _sample(body, "fridly_threadpool_size") > 0
+
+
+def test_metrics_are_not_public(client, register, scrape, monkeypatch):
+    _, user = register()
+    assert client.get("/api/metrics").status_code == 403
+    # nemmeno con il token di un utente o un token sbagliato
+    assert client.get("/api/metrics", headers=user).status_code == 403
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer nope"}).status_code == 403
+    assert scrape().status_code == 200
+
+    # senza token solo dagli IP ammessi (il TestClient si presenta come "testclient")
+    monkeypatch.setattr("app.api.routes.METRICS_TOKEN", "")
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer "}).status_code == 403
+    monkeypatch.setattr("app.api.routes.METRICS_ALLOWED_HOSTS", {"testclient"})
+    assert client.get("/api/metrics").status_code == 200
+
+
+@pytest.mark.parametrize("poolclass", [NullPool, StaticPool])
+def test_pools_without_limits_are_skipped(poolclass):
+    # nessuna connessione viene aperta: basta l'URL
+    probe = create_engine("postgresql+psycopg:///unused", poolclass=poolclass)
+    try:
+        assert pool_saturated(probe) is False
+        assert PoolCollector(probe).collect() == []
+    finally:
+        probe.dispose()
+
+
+def test_ready(client):
+    r = client.get("/api/ready")
+    assert r.status_code == 200
+    assert r.json()["ready"] is True
+    assert r.json()["db_latency_ms"] >= 0
+
+
+def test_readiness_is_cached(engine):
+    check = ReadinessCheck(engine, ttl=60)
+    try:
+        first = check.get()
+        assert first.ready
+        assert check.get() is first  # nessuna nuova query entro il ttl
+
+        check.ttl = 0
+        time.sleep(0.01)
+        assert check.get() is not first
+    finally:
+        check.close()
+
+
+def test_not_ready_while_check_hangs(engine):
+    check = ReadinessCheck(engine, ttl=0.01, max_db_ms=300)
+    first = check.get()
+    entered, release = threading.Event(), threading.Event()
+
+    def hanging():
+        entered.set()
+        release.wait(5)
+        return first
+
+    check._check = hanging
+    time.sleep(0.02)
+    probe = threading.Thread(target=check.get)
+    probe.start()
+    try:
+        assert entered.wait(1)
+        assert check.get() is first  # ultimo risultato ancora recente
+
+        time.sleep(0.35)
+        started = time.monotonic()
+        result = check.get()
+        assert time.monotonic() - started < 0.1  # non si accoda al controllo bloccato
+        assert result.ready is False
+        assert "in corso" in result.reason
+    finally:
+        release.set()
+        probe.join()
+        check.close()
+
+
+def test_probe_connection_has_timeouts(engine):
+    check = ReadinessCheck(engine, max_db_ms=200)
+    try:
+        probe = check._probe_engine()
+        with probe.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT pg_sleep(2)"))  # statement_timeout
+            conn.rollback()
+
+            # l'unica connessione è occupata: attesa nel pool di max_db_ms, non 30 s
+            started = time.monotonic()
+            result = check._check()
+            assert time.monotonic() - started < 1
+        assert result.ready is False
+        assert result.reason == "database non raggiungibile: TimeoutError"
+    finally:
+        check.close()
+
+
+def test_not_ready_when_db_unreachable(engine):
+    broken = create_engine(engine.url.set(host="/nonexistent", port=1))
+    check = ReadinessCheck(broken)
+    try:
+        result = check.get()
+    finally:
+        check.close()
+        broken.dispose()
+    assert result.ready is False
+    assert "database non raggiungibile" in result.reason
@@ -0,0 +1,126 @@
+import threading
+from pathlib import Path
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import text
+
+from migrations import online
+from migrations.scripts.check_migrations import VERSIONS_DIR, check_source
+
+BLOCKING_REVISION = '''
+def upgrade():
+    op.create_table('nuova', sa.Column('id', sa.Integer()))
+    op.create_index('ix_nuova_id', 'nuova', ['id'])
+    op.create_index('ix_items_location', 'inventory_items', ['location'])
+    op.create_index('ix_items_unit', 'inventory_items', ['unit'], postgresql_concurrently=True)
+    op.create_index('ix_products_brand', 'products', ['brand'])  # online-ok
+    op.create_foreign_key('fk_x', 'inventory_items', 'products', ['product_id'], ['id'])
+    op.add_column('inventory_items', sa.Column('note', sa.String(), nullable=False))
+    op.add_column('inventory_items', sa.Column('opened', sa.Boolean(), nullable=True))
+    op.alter_column('inventory_items', 'location', nullable=False)
+    op.execute("CREATE INDEX ix_raw ON inventory_items (unit)")
+    op.execute("ALTER TABLE inventory_items ADD CONSTRAINT ck_q CHECK (quantity > 0) NOT VALID")
+'''
+
+
+def test_current_revisions_are_online_safe():
+    problems = []
+    for path in sorted(Path(VERSIONS_DIR).glob("*.py")):
+        problems += check_source(path.read_text(encoding="utf-8"), path.name)
+    assert problems == []
+
+
+def test_checker_flags_blocking_operations():
+    problems = check_source(BLOCKING_REVISION, "rev.py")
+    flagged_lines = sorted(int(p.split(":")[1]) for p in problems)
+    # righe 5 (create_index), 8 (FK), 9 (NOT NULL), 11 (alter_column), 12 (CREATE INDEX raw)
+    assert flagged_lines == [5, 8, 9, 11, 12]
+
+
+FSTRING_REVISION = '''
+TABLE = 'inventory_items'
+def upgrade():
+    op.execute(f"CREATE INDEX ix_raw ON {TABLE} (unit)")
+    op.execute(f"CREATE INDEX CONCURRENTLY ix_ok ON {TABLE} (unit)")
+    op.execute(f"ALTER TABLE {TABLE} " + "ADD CONSTRAINT ck_q CHECK (quantity > 0)")
+    op.execute(sa.text(f"ALTER TABLE {TABLE} ADD CONSTRAINT pk PRIMARY KEY USING INDEX {TABLE}_tmp"))
+    op.execute(build_sql(TABLE))
+'''
+
+
+def test_checker_reads_fstrings_and_rejects_opaque_sql():
+    problems = check_source(FSTRING_REVISION, "rev.py")
+    flagged_lines = sorted(int(p.split(":")[1]) for p in problems)
+    # righe 4 (CREATE INDEX in f-string), 6 (f-string + costante), 8 (SQL non ricostruibile)
+    assert flagged_lines == [4, 6, 8]
+
+
+def test_online_helpers(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS online_probe"))
+        conn.execute(text(
+            "CREATE TABLE online_probe (id serial PRIMARY KEY, qty int, qty_copy int)"
+        ))
+        conn.execute(text("INSERT INTO online_probe (qty) SELECT g FROM generate_series(1, 250) g"))
+
+    try:
+        with engine.connect() as conn:
+            ctx = MigrationContext.configure(conn)
+            with Operations.context(ctx), ctx.begin_transaction():
+                updated = online.backfill_in_batches(
+                    "online_probe", "qty_copy = qty", "qty_copy IS NULL",
+                    batch_size=100, pause_seconds=0,
+                )
+                online.create_index_concurrently("ix_online_probe_qty", "online_probe", ["qty"])
+                online.add_check_not_valid("ck_online_probe_qty_copy", "online_probe",
+                                           "qty_copy IS NOT NULL")
+                online.validate_constraint("ck_online_probe_qty_copy", "online_probe")
+
+        assert updated == 250
+        with engine.connect() as conn:
+            assert conn.execute(text(
+                "SELECT count(*) FROM online_probe WHERE qty_copy = qty"
+            )).scalar() == 250
+            assert conn.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = 'ix_online_probe_qty'"
+            )).scalar() is True
+            assert conn.execute(text(
+                "SELECT convalidated FROM pg_constraint WHERE conname = 'ck_online_probe_qty_copy'"
+            )).scalar() is True
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS online_probe"))
+
+
+def test_concurrent_index_ignores_lock_timeout(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS online_probe"))
+        conn.execute(text("CREATE TABLE online_probe (id serial PRIMARY KEY, qty int)"))
+
+    blocker = engine.connect()
+    try:
+        # una transazione che tiene la tabella più a lungo del lock_timeout
+        blocker.execute(text("LOCK TABLE online_probe IN SHARE UPDATE EXCLUSIVE MODE"))
+        release = threading.Timer(0.5, blocker.rollback)
+        release.start()
+        with engine.connect() as conn:
+            conn.execute(text("SET lock_timeout = '100ms'"))
+            conn.commit()
+            ctx = MigrationContext.configure(conn)
+            with Operations.context(ctx), ctx.begin_transaction():
+                online.create_index_concurrently("ix_online_probe_qty", "online_probe", ["qty"])
+            # fuori dagli indici concorrenti il timeout della migrazione torna quello di prima
+            assert conn.execute(text("SHOW lock_timeout")).scalar() == "100ms"
+        release.join()
+
+        with engine.connect() as conn:
+            assert conn.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = 'ix_online_probe_qty'"
+            )).scalar() is True
+    finally:
+        blocker.close()
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS online_probe"))
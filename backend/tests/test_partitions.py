@@ -0,0 +1,73 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from app.core.partitions import (
+    detach_partitions_before, ensure_month_partitions, list_partitions, partition_name
+)
+from app.models.consumption_event import ConsumptionEvent
+from app.models.household import Household
+from app.models.product import Product
+
+
+def _count(db, table):
+    return db.execute(text(f'SELECT count(*) FROM "{table}"')).scalar()
+
+
+def test_default_partition_catches_rows_and_hands_them_over(db):
+    # mese lontano: nessuna partizione, come se il cron fosse fermo da anni
+    month = date(2040, 5, 1)
+    hh = Household(name="Casa")
+    product = Product(name="Latte")
+    db.add_all([hh, product])
+    db.flush()
+    db.add(ConsumptionEvent(
+        household_id=hh.id, product_id=product.id, event_type="wasted",
+        quantity=1, unit="pz", occurred_at=datetime(2040, 5, 10, tzinfo=timezone.utc),
+    ))
+    db.flush()
+    assert _count(db, "consumption_events_default") == 1
+
+    conn = db.connection()
+    ensure_month_partitions(conn, start=month, months_ahead=0)
+
+    name = partition_name("consumption_events", month)
+    assert name in list_partitions(conn)
+    assert _count(db, name) == 1
+    assert _count(db, "consumption_events_default") == 0
+    # e rilanciarlo non fa niente
+    ensure_month_partitions(conn, start=month, months_ahead=0)
+    assert _count(db, name) == 1
+
+
+def test_detach_old_partitions_concurrently_keeps_default(engine):
+    old = date(2001, 1, 1)
+    name = partition_name("consumption_events", old)
+    with engine.begin() as conn:
+        ensure_month_partitions(conn, start=old, months_ahead=0)
+        hh_id = conn.execute(text("INSERT INTO households (name) VALUES ('Casa') RETURNING id")).scalar()
+        product_id = conn.execute(text("INSERT INTO products (name) VALUES ('Pane') RETURNING id")).scalar()
+        conn.execute(
+            text(
+                "INSERT INTO consumption_events "
+                "(household_id, product_id, event_type, quantity, unit, occurred_at) "
+                "VALUES (:hh, :p, 'wasted', 1, 'pz', '2001-01-15')"
+            ),
+            {"hh": hh_id, "p": product_id},
+        )
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            detached = detach_partitions_before(conn, date(2001, 3, 1), archive_schema="archive_test")
+            assert detached == [name]
+            partitions = list_partitions(conn)
+            assert name not in partitions
+            assert "consumption_events_default" in partitions
+            assert conn.execute(text(f'SELECT count(*) FROM archive_test."{name}"')).scalar() == 1
+            # niente da fare al secondo giro
+            assert detach_partitions_before(conn, date(2001, 3, 1)) == []
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA IF EXISTS archive_test CASCADE"))
+            conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+            conn.execute(text("DELETE FROM households WHERE id = :id"), {"id": hh_id})
+            conn.execute(text("DELETE FROM products WHERE id = :id"), {"id": product_id})
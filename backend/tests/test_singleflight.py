@@ -0,0 +1,199 @@
+import threading
+import time
+
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+
+from app.api.households import DEFAULT_FIELDS, household_flight
+from app.core.singleflight import SingleFlight
+from app.schemas.household import HouseholdFieldsOut
+
+
+def _calls(flight, role):
+    value = REGISTRY.get_sample_value(
+        "fridly_singleflight_calls_total", {"flight": flight, "role": role}
+    )
+    return value or 0
+
+
+def _run_concurrently(flight, n, fn):
+    """n thread chiamano flight.do("k", fn) mentre il primo caricamento è bloccato."""
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(flight.do("k", fn))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def test_concurrent_calls_share_one_load():
+    flight = SingleFlight("test-share")
+    release = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        release.wait(5)
+        return {"value": 42}
+
+    threads, results, errors = _run_concurrently(flight, 8, load)
+    # tutti dentro (leader nel caricamento, follower in attesa) prima di sbloccare
+    while _calls("test-share", "leader") + _calls("test-share", "follower") < 8:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert loads == [1]
+    assert results == [{"value": 42}] * 8 and not errors
+    assert _calls("test-share", "leader") == 1
+    assert _calls("test-share", "follower") == 7
+
+    # finito il caricamento non resta niente: la chiamata dopo ricarica
+    assert flight.do("k", lambda: "di nuovo") == "di nuovo"
+
+
+def test_error_is_shared_and_not_cached():
+    flight = SingleFlight("test-error")
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        raise ValueError("db giù")
+
+    threads, results, errors = _run_concurrently(flight, 3, load)
+    while _calls("test-error", "leader") + _calls("test-error", "follower") < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert not results and len(errors) == 3
+    # un'istanza per chiamante (traceback separati), i follower puntano a quella del leader
+    [original] = [e for e in errors if e.__cause__ is None]
+    followers = [e for e in errors if e is not original]
+    assert all(type(e) is ValueError and e.args == ("db giù",) for e in errors)
+    assert all(e.__cause__ is original for e in followers)
+    assert len({id(e) for e in errors}) == 3
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+def test_followers_get_their_own_http_exception():
+    flight = SingleFlight("test-http-error")
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        raise HTTPException(status_code=404, detail="Household non trovata")
+
+    threads, results, errors = _run_concurrently(flight, 3, load)
+    while _calls("test-http-error", "leader") + _calls("test-http-error", "follower") < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len({id(e) for e in errors}) == 3
+    assert {(e.status_code, e.detail) for e in errors} == {(404, "Household non trovata")}
+
+
+def test_calls_after_forget_start_a_new_load():
+    flight = SingleFlight("test-forget")
+    started, release = threading.Event(), threading.Event()
+
+    def stale_load():
+        started.set()
+        release.wait(5)
+        return "prima della scrittura"
+
+    leader = threading.Thread(target=flight.do, args=("k", stale_load), kwargs={"scope": 1})
+    leader.start()
+    try:
+        assert started.wait(5)
+        flight.forget(2)    # altro scope: il caricamento in corso resta condivisibile
+        flight.forget(1)    # scrittura sulla casa 1, dopo il commit
+        assert flight.do("k", lambda: "dopo la scrittura", scope=1) == "dopo la scrittura"
+    finally:
+        release.set()
+        leader.join(5)
+    assert flight.do("k", lambda: "di nuovo", scope=1) == "di nuovo"
+
+
+def test_get_household_checks_membership_per_caller(client, register):
+    _, alice = register()
+    _, bob = register()
+    hh = client.post("/api/households/", json={"name": "Casa"}, headers=alice).json()
+
+    # caricamento "in volo" per questa casa, tenuto aperto dal test
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        started.set()
+        release.wait(5)
+        return HouseholdFieldsOut(id=hh["id"], name="dal leader")
+
+    leader = threading.Thread(
+        target=household_flight.do, args=((hh["id"], DEFAULT_FIELDS), slow_load)
+    )
+    leader.start()
+    try:
+        assert started.wait(5)
+        # bob non è membro: 404 subito, senza agganciarsi al caricamento in corso
+        assert client.get(f"/api/households/{hh['id']}", headers=bob).status_code == 404
+
+        # alice sì: aspetta il leader e riceve il suo risultato
+        threading.Timer(0.1, release.set).start()
+        r = client.get(f"/api/households/{hh['id']}", headers=alice)
+        assert r.status_code == 200
+        assert r.json() == {"id": hh["id"], "name": "dal leader"}
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_writer_does_not_get_a_load_started_before_its_write(client, register):
+    _, owner = register()
+    guest_email, _ = register()
+    hh = client.post("/api/households/", json={"name": "Casa"}, headers=owner).json()
+
+    # GET della casa partita prima dell'invito, ancora in volo
+    started, release = threading.Event(), threading.Event()
+
+    def stale_load():
+        started.set()
+        release.wait(5)
+        return HouseholdFieldsOut(id=hh["id"], name="prima dell'invito")
+
+    leader = threading.Thread(
+        target=household_flight.do,
+        args=((hh["id"], DEFAULT_FIELDS), stale_load),
+        kwargs={"scope": hh["id"]},
+    )
+    leader.start()
+    try:
+        assert started.wait(5)
+        r = client.post(f"/api/households/{hh['id']}/members", json={"email": guest_email},
+                        headers=owner)
+        assert r.status_code == 200
+
+        # chi ha scritto rilegge subito la casa con il nuovo membro
+        r = client.get(f"/api/households/{hh['id']}", headers=owner)
+        assert guest_email in [m["email"] for m in r.json()["members"]]
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_sequential_requests_are_all_leaders(client, register):
+    _, headers = register()
+    hh = client.post("/api/households/", json={"name": "Casa"}, headers=headers).json()
+    before = _calls("household", "leader")
+    for _ in range(3):
+        assert client.get(f"/api/households/{hh['id']}", headers=headers).json() == hh
+    assert _calls("household", "leader") == before + 3
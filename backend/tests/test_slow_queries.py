@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.slow_queries import SlowQueryLog, can_analyze, normalize_sql, redact, to_prepared
+
+
+def test_normalize_sql_groups_queries_that_differ_only_by_values():
+    a = normalize_sql("SELECT * FROM items WHERE id IN (1, 2, 3) AND name = 'latte'")
+    b = normalize_sql("SELECT *  FROM items\n WHERE id IN (4) AND name = 'pane'")
+    assert a == b == "SELECT * FROM items WHERE id IN (...) AND name = ?"
+
+
+def test_redact_keeps_names_and_types_only():
+    assert redact({"email": "a@example.com", "id": 3}) == {"email": "<str>", "id": "<int>"}
+
+
+def test_to_prepared_numbers_placeholders_in_order():
+    statement, values = to_prepared(
+        "SELECT * FROM t WHERE a = %(x)s AND b LIKE 'l%%' OR c = %(y)s OR d = %(x)s",
+        {"x": 1, "y": "latte"},
+    )
+    assert statement == "SELECT * FROM t WHERE a = $1 AND b LIKE 'l%' OR c = $2 OR d = $1"
+    assert values == [1, "latte"]
+
+
+def test_only_side_effect_free_selects_are_analyzed():
+    assert can_analyze("SELECT count(*) FROM items WHERE id IN (%(a)s) AND name = 'for update'")
+    assert can_analyze("WITH x AS (SELECT lower(name) AS n FROM products) SELECT n FROM x")
+    # lock sulle righe, funzioni con effetti o sconosciute, scritture: solo EXPLAIN
+    assert not can_analyze("SELECT * FROM items WHERE id = %(id)s FOR UPDATE")
+    assert not can_analyze("SELECT * FROM items FOR NO KEY UPDATE SKIP LOCKED")
+    assert not can_analyze("SELECT * FROM items FOR KEY SHARE")
+    assert not can_analyze("SELECT pg_advisory_xact_lock(%(key)s)")
+    assert not can_analyze("SELECT nextval('items_id_seq')")
+    assert not can_analyze("WITH d AS (DELETE FROM items RETURNING id) SELECT id FROM d")
+    assert not can_analyze("SELECT * INTO copia FROM items")
+
+
+def test_slow_query_is_recorded_with_plan(engine):
+    log = SlowQueryLog(threshold_ms=20)
+    probe = create_engine(engine.url)
+    log.install(probe)
+    try:
+        with probe.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            for seconds in (0.03, 0.04):
+                conn.execute(text("SELECT pg_sleep(:s)"), {"s": seconds})
+        log.wait_for_explains()
+
+        [entry] = log.snapshot()
+        assert entry["count"] == 2
+        assert entry["p50_ms"] >= 20
+        assert entry["last_parameters"] == {"s": "<float>"}
+        assert "<fuori da una richiesta>" in entry["routes"]
+        assert "Execution Time" in entry["plan"]
+    finally:
+        probe.dispose()
+
+
+def test_plan_does_not_contain_parameter_values(engine):
+    log = SlowQueryLog(threshold_ms=20)
+    probe = create_engine(engine.url)
+    log.install(probe)
+    try:
+        with probe.connect() as conn:
+            conn.execute(
+                text("SELECT pg_sleep(0.03) WHERE :email <> ''"),
+                {"email": "anna@example.com"},
+            )
+        log.wait_for_explains()
+
+        [entry] = log.snapshot()
+        assert "Execution Time" in entry["plan"]
+        assert "$1" in entry["plan"]
+        assert "anna@example.com" not in entry["plan"]
+    finally:
+        probe.dispose()
+
+
+def test_for_update_is_never_analyzed(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS slow_probe"))
+        conn.execute(text("CREATE TABLE slow_probe (id int PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO slow_probe VALUES (1)"))
+    log = SlowQueryLog(threshold_ms=20)
+    probe = create_engine(engine.url)
+    log.install(probe)
+    try:
+        with probe.begin() as conn:
+            conn.execute(text("SELECT id, pg_sleep(0.03) FROM slow_probe FOR UPDATE"))
+        log.wait_for_explains()
+
+        [entry] = log.snapshot()
+        assert "LockRows" in entry["plan"]
+        assert "Execution Time" not in entry["plan"]
+        assert "actual" not in entry["plan"]
+    finally:
+        probe.dispose()
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS slow_probe"))
+
+
+def test_failed_statements_do_not_skew_timings(engine):
+    log = SlowQueryLog(threshold_ms=20)
+    probe = create_engine(engine.url)
+    log.install(probe)
+    try:
+        with probe.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(DBAPIError):
+                    conn.execute(text("SELECT pg_sleep(0.03), 1 / 0"))
+                conn.rollback()
+            conn.execute(text("SELECT 1"))
+            assert not any(str(key).startswith("slow_query") for key in conn.info)
+        log.wait_for_explains()
+
+        # le query fallite non vengono registrate, quella veloce neanche
+        assert log.snapshot() == []
+    finally:
+        probe.dispose()
+
+
+def test_admin_endpoint_requires_admin(client, register):
+    _, headers = register()
+    assert client.get("/api/admin/slow-queries", headers=headers).status_code == 403
+
+
+def test_admin_endpoint_bounds_limit(client, register, monkeypatch):
+    email, headers = register()
+    monkeypatch.setattr("app.api.admin.ADMIN_EMAILS", {email})
+    assert client.get("/api/admin/slow-queries?limit=0", headers=headers).status_code == 422
+    assert client.get("/api/admin/slow-queries?limit=100000", headers=headers).status_code == 422
+    assert client.get("/api/admin/slow-queries?limit=10", headers=headers).status_code == 200
@@ -0,0 +1,96 @@
+from datetime import date, datetime, timezone
+
+import numpy as np
+from sqlalchemy import text
+
+from app.jobs import waste_rollup
+from app.jobs.waste_rollup import aggregate_batch
+
+
+def test_aggregate_batch_groups_and_sums():
+    columns = {
+        "household_id": np.array([1, 1, 1, 2]),
+        "product_id": np.array([10, 10, 11, 10]),
+        "category": np.array(["latticini", "latticini", "pane", "latticini"]),
+        "event_type": np.array(["wasted", "wasted", "wasted", "consumed"]),
+        "unit": np.array(["pz", "pz", "g", "pz"]),
+        "quantity": np.array([2, 3, 500, 1]),
+        "day": np.array(["2026-10-01", "2026-10-01", "2026-10-02", "2026-10-01"], dtype="datetime64[D]"),
+    }
+    rows = aggregate_batch(columns, "day")
+    by_key = {(r["household_id"], r["product_id"], r["day"]): r for r in rows}
+    assert len(rows) == 3
+    assert by_key[(1, 10, date(2026, 10, 1))] == {
+        "household_id": 1, "product_id": 10, "category": "latticini", "event_type": "wasted",
+        "unit": "pz", "day": date(2026, 10, 1), "quantity": 5, "events": 2,
+    }
+    assert by_key[(1, 11, date(2026, 10, 2))]["quantity"] == 500
+    assert by_key[(2, 10, date(2026, 10, 1))]["events"] == 1
+    assert aggregate_batch({**columns, "quantity": np.array([], dtype=np.int64)}, "day") == []
+
+
+def _add_event(conn, hh_id, product_id, occurred_at, quantity):
+    conn.execute(
+        text(
+            "INSERT INTO consumption_events "
+            "(household_id, product_id, event_type, quantity, unit, occurred_at) "
+            "VALUES (:hh, :p, 'wasted', :q, 'pz', :at)"
+        ),
+        {"hh": hh_id, "p": product_id, "q": quantity, "at": occurred_at},
+    )
+
+
+def _totals(conn, hh_id):
+    return tuple(conn.execute(
+        text("SELECT sum(quantity), sum(events) FROM waste_rollups_daily WHERE household_id = :hh"),
+        {"hh": hh_id},
+    ).one())
+
+
+def test_rollup_counts_late_commits_exactly_once(engine):
+    # il watermark dipende dalle transazioni finite: qui servono commit veri
+    now = datetime.now(tz=timezone.utc)
+    with engine.begin() as conn:
+        hh_id = conn.execute(text("INSERT INTO households (name) VALUES ('Casa') RETURNING id")).scalar()
+        product_id = conn.execute(text("INSERT INTO products (name) VALUES ('Latte') RETURNING id")).scalar()
+    try:
+        with engine.begin() as conn:
+            _add_event(conn, hh_id, product_id, now, 2)
+        with engine.begin() as conn:
+            assert waste_rollup.run(conn) >= 1
+            assert _totals(conn, hh_id) == (2, 1)
+
+        # transazione lenta: l'evento ha un occurred_at vecchio ma il commit arriva
+        # dopo il giro del job (o l'orologio dell'app è indietro)
+        late = engine.connect()
+        late_tx = late.begin()
+        _add_event(late, hh_id, product_id, datetime(2026, 1, 1, tzinfo=timezone.utc), 3)
+        with engine.begin() as conn:
+            waste_rollup.run(conn)
+            assert _totals(conn, hh_id) == (2, 1)  # non ancora visibile: non contato
+        late_tx.commit()
+        late.close()
+
+        with engine.begin() as conn:
+            waste_rollup.run(conn)
+            assert _totals(conn, hh_id) == (5, 2)
+        with engine.begin() as conn:
+            assert waste_rollup.run(conn) == 0  # niente doppioni
+            assert _totals(conn, hh_id) == (5, 2)
+            watermark = conn.execute(
+                text("SELECT processed_xact_id FROM rollup_watermarks WHERE name = :n"),
+                {"n": waste_rollup.WATERMARK_NAME},
+            ).scalar()
+            newest = conn.execute(
+                text("SELECT max(xact_id) FROM consumption_events WHERE household_id = :hh"),
+                {"hh": hh_id},
+            ).scalar()
+            assert watermark > newest
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM households WHERE id = :id"), {"id": hh_id})
+            conn.execute(text("DELETE FROM products WHERE id = :id"), {"id": product_id})
+            conn.execute(
+                text("DELETE FROM rollup_watermarks WHERE name = :n"),
+                {"n": waste_rollup.WATERMARK_NAME},
+            )